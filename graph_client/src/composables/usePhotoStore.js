@@ -43,6 +43,27 @@ export function usePhotoStore() {
         }
     }
 
+    // 按游标分页获取照片（用于无限滚动），cursor 为 null 时获取第一页
+    // type: 'user'（正常照片）或 'trash'（回收站）
+    const getPhotosPage = async (cursor = null, limit = 50, type = 'user') => {
+        const userId = getCurrentUserId()
+        if (!userId) return {photos: [], nextCursor: null}
+
+        try {
+            const params = new URLSearchParams({cursor: cursor || '', limit: String(limit)})
+            const response = await fetch(`${API_BASE_URL}/photos/${type}/${userId}?${params}`)
+            const data = await response.json()
+
+            if (data.success) {
+                return {photos: data.photos, nextCursor: data.next_cursor}
+            }
+            return {photos: [], nextCursor: null}
+        } catch (error) {
+            console.error('分页获取照片失败:', error)
+            return {photos: [], nextCursor: null}
+        }
+    }
+
     // 获取最近照片
     const getRecentPhotos = async () => {
         const userId = getCurrentUserId()
@@ -415,6 +436,7 @@ export function usePhotoStore() {
     return {
         getUserId,
         getAllPhotos,
+        getPhotosPage,
         getRecentPhotos,
         getTrashPhotos,
         getPhotosByAlbum,
@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-from config.database import db_init
+from config.database import db_init, get_pool_stats
 from routes.user_routes import user_bp
 from routes.album_routes import album_bp
 from routes.photo_routes import photo_bp
@@ -32,6 +32,12 @@ def hello():
     return jsonify({"message": "欢迎使用相册API"})
 
 
+# 数据库连接池统计信息（连接数、借出等待时间等）
+@app.route('/api/db/pool_stats')
+def db_pool_stats():
+    return jsonify({"success": True, "stats": get_pool_stats()})
+
+
 # 提供静态文件访问
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
@@ -0,0 +1,58 @@
+"""
+对比两种启动方式的冷启动耗时（构造 RetrievalModel 到第一次查询编码完成）和峰值内存（RSS）：
+  - checkpoint: 读取完整的 HF checkpoint，启动时逐层量化（use_packed=True）
+  - artifact: 直接加载 model_artifact.py 导出的已量化产物
+每种方式在独立的子进程中运行，互不影响。
+用法: python benchmarks/cold_start_benchmark.py <产物目录>
+"""
+import sys
+import os
+import json
+import subprocess
+import time
+import resource
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_once(mode, artifact_dir):
+    """在当前进程中启动模型并完成第一次查询，打印 JSON 结果"""
+    start = time.perf_counter()
+    from retrieval_model.retrieval import RetrievalModel
+    imported = time.perf_counter()
+    if mode == "artifact":
+        model = RetrievalModel(quantized=True, artifact_path=artifact_dir)
+    else:
+        model = RetrievalModel(quantized=True, use_packed=True)
+    loaded = time.perf_counter()
+    model.extract_embeddings(texts=["a dog running on the beach"])
+    first_query = time.perf_counter()
+
+    print(json.dumps({
+        "import_s": imported - start,
+        "load_s": loaded - imported,
+        "first_query_s": first_query - start,
+        # Linux 上 ru_maxrss 的单位是 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == "--child":
+        run_once(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        return
+    if len(sys.argv) < 2:
+        print("用法: python benchmarks/cold_start_benchmark.py <产物目录>")
+        sys.exit(1)
+    artifact_dir = sys.argv[1]
+
+    print(f"{'mode':<12} {'import(s)':>10} {'load(s)':>10} {'ttfq(s)':>10} {'peak RSS(MB)':>13}")
+    for mode in ("checkpoint", "artifact"):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, artifact_dir],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<12} {result['import_s']:>10.2f} {result['load_s']:>10.2f} "
+              f"{result['first_query_s']:>10.2f} {result['peak_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+对照片列表/检索相关的查询执行 EXPLAIN，检查是否还存在全表扫描（type = ALL），并统计查询耗时。
+SQL 直接取自 models/photo.py 中的方法：临时替换模块里的 execute_query 记录实际执行的 SQL 和参数。
+用法: python benchmarks/explain_listing_queries.py [user_id] [album_id]
+"""
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import execute_query
+import models.photo as photo_module
+from models.photo import Photo
+
+
+def capture_sql(fn, *args, **kwargs):
+    """
+    调用 Photo 的方法，返回它执行的所有 (query, params)
+    """
+    captured = []
+
+    def recorder(query, params=None, fetch=False):
+        captured.append((query, params))
+        return [] if fetch else None
+
+    original = photo_module.execute_query
+    photo_module.execute_query = recorder
+    try:
+        fn(*args, **kwargs)
+    finally:
+        photo_module.execute_query = original
+    return captured
+
+
+def explain(query, params):
+    return execute_query("EXPLAIN " + query, params, fetch=True) or []
+
+
+def time_query(query, params, runs=20):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        execute_query(query, params, fetch=True)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main():
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    album_id = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    sample = execute_query("SELECT id, address FROM photos WHERE user_id = %s LIMIT 5", (user_id,), fetch=True) or []
+    sample_ids = [row['id'] for row in sample] or [1]
+    sample_addrs = [row['address'] for row in sample] or [f"uploads/{user_id}/example.jpg"]
+
+    cases = {
+        "find_by_user": lambda: Photo.find_by_user(user_id, 20, 0),
+        "find_in_trash": lambda: Photo.find_in_trash(user_id, 20, 0),
+        "get_recent": lambda: Photo.get_recent(user_id, 20),
+        "find_by_album": lambda: Photo.find_by_album(album_id),
+        "search": lambda: Photo.search(user_id, sample_addrs[0]),
+        "search_recent": lambda: Photo.search_recent(user_id, sample_addrs[0]),
+        "find_by_ids": lambda: Photo.find_by_ids(user_id, sample_ids, 'all'),
+        "find_by_addresses": lambda: Photo.find_by_addresses(user_id, sample_addrs, 'all'),
+    }
+
+    scans = []
+    print(f"{'query':<20} {'type':<8} {'key':<32} {'rows':>8} {'median(ms)':>11}  extra")
+    for name, call in cases.items():
+        for query, params in capture_sql(call):
+            for row in explain(query, params):
+                if row.get('table') != 'photos':
+                    continue
+                print(f"{name:<20} {str(row.get('type')):<8} {str(row.get('key')):<32} {str(row.get('rows')):>8} "
+                      f"{time_query(query, params):>11.2f}  {row.get('Extra') or ''}")
+                if row.get('type') == 'ALL':
+                    scans.append(name)
+
+    if scans:
+        print(f"\n以下查询仍在全表扫描: {', '.join(scans)}（是否已执行 migrations/0003_add_photo_indexes.py？）")
+        sys.exit(1)
+    print("\n所有列表查询均使用了索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+对比两种中文查询路径的检索效果和延迟：
+  - translate: 百度翻译成英文 -> BGE-VL 文本编码 -> 检索
+  - multilingual: 多语言编码器直接编码中文 -> 投影到 BGE-VL 空间 -> 检索
+评测集每行一条 "中文查询\t目标照片ID"，recall@k 表示目标照片出现在前 k 个结果中的比例。
+用法: python benchmarks/multilingual_query_benchmark.py <user_id> <评测集.tsv> <baidu_appid> <baidu_appkey>
+"""
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval_model.retrieval import RetrievalModel
+from services.retrieval_provider import encoder_kwargs
+from services.translator import BaiduTranslator
+
+KS = (1, 5, 10)
+UTILS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "retrieval_model", "utils")
+
+
+def load_eval_set(path):
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2 and parts[0] and parts[1].isdigit():
+                cases.append((parts[0], int(parts[1])))
+    return cases
+
+
+def run(name, encode, model, user_id, cases):
+    hits = {k: 0 for k in KS}
+    latencies = []
+    for query, photo_id in cases:
+        start = time.perf_counter()
+        feature = encode(query)
+        results = model.search(user_id, feature, k=max(KS)) if feature is not None else []
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked = [item[3] for item in results or []]
+        for k in KS:
+            if photo_id in ranked[:k]:
+                hits[k] += 1
+
+    latencies.sort()
+    recalls = "  ".join(f"R@{k}={hits[k] / len(cases):.3f}" for k in KS)
+    print(f"{name:<14} {recalls}  p50={statistics.median(latencies):.1f}ms  "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0]:.1f}ms")
+
+
+def main():
+    if len(sys.argv) < 5:
+        print("用法: python benchmarks/multilingual_query_benchmark.py <user_id> <评测集.tsv> <baidu_appid> <baidu_appkey>")
+        sys.exit(1)
+    user_id, eval_path, appid, appkey = sys.argv[1:5]
+
+    cases = load_eval_set(eval_path)
+    if not cases:
+        print("评测集为空")
+        sys.exit(1)
+
+    # 与服务使用同一个编码器，评测的是线上实际的向量空间
+    model = RetrievalModel(**encoder_kwargs(),
+                           multilingual_model_path=os.path.join(UTILS_DIR, "hf_models", "multilingual-text"),
+                           multilingual_projection_path=os.path.join(UTILS_DIR, "multilingual_projection.npz"))
+    if model.multilingual_encoder is None:
+        print("多语言投影与当前编码器不一致，请先重新拟合投影")
+        sys.exit(1)
+    translator = BaiduTranslator(appid, appkey)
+
+    def translate_then_encode(query):
+        en_query = translator.translate(query) or query
+        features = model.extract_embeddings(texts=[en_query])
+        return None if features is None else features[0]
+
+    def multilingual_encode(query):
+        return model.multilingual_encoder.encode([query])[0]
+
+    # 预热：加载用户索引，并让两条路径各跑一次
+    model.check_dependencies(user_id)
+    translate_then_encode(cases[0][0])
+    multilingual_encode(cases[0][0])
+
+    print(f"用户 {user_id}，评测查询 {len(cases)} 条")
+    run("translate", translate_then_encode, model, user_id, cases)
+    run("multilingual", multilingual_encode, model, user_id, cases)
+
+
+if __name__ == "__main__":
+    main()
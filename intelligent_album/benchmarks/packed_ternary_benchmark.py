@@ -0,0 +1,68 @@
+"""
+对比 fp32 模型、TnLinear（推理模式）和 2 bit 打包三值模型（PackedTnLinear）在 CPU 上的内存占用和吞吐量，
+并检查打包模型的输出与 TnLinear 是否一致（两者的三值化方式相同，结果应只有浮点误差）。
+用法: python benchmarks/packed_ternary_benchmark.py [runs] [batch_size]
+"""
+import sys
+import os
+import copy
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoModel
+
+from retrieval_model.utils.TnModules import replace_linear
+from retrieval_model.utils.PackedTnModules import replace_linear2packed, model_nbytes
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "retrieval_model", "utils", "my_saved_model")
+QUERIES = ["a dog running on the beach", "sunset over the mountains", "birthday cake with candles",
+           "a cat sleeping on the sofa", "people walking in the snow", "a red car parked on the street",
+           "children playing football", "a bowl of noodles"]
+
+
+def throughput(model, runs, batch_size):
+    """返回 (单条查询平均延迟 ms, 批量编码吞吐 条/秒, 最后一次批量输出)"""
+    texts = (QUERIES * (batch_size // len(QUERIES) + 1))[:batch_size]
+    model.encode(text=texts[:1])
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        for query in QUERIES:
+            model.encode(text=[query])
+    single = (time.perf_counter() - start) * 1000 / (runs * len(QUERIES))
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        outputs = model.encode(text=texts)
+    batched = runs * batch_size / (time.perf_counter() - start)
+    return single, batched, outputs
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    torch.set_grad_enabled(False)
+
+    fp32 = AutoModel.from_pretrained(MODEL_PATH, trust_remote_code=True).to(torch.device("cpu"))
+    fp32.set_processor(MODEL_PATH)
+    fp32.eval()
+
+    ternary = copy.deepcopy(fp32)
+    replace_linear(ternary, inference=True)
+    packed = copy.deepcopy(fp32)
+    replace_linear2packed(packed)
+
+    print(f"{'model':<10} {'MB':>9} {'single(ms)':>11} {'batch(q/s)':>11}")
+    outputs = {}
+    for name, model in (("fp32", fp32), ("ternary", ternary), ("packed", packed)):
+        single, batched, outputs[name] = throughput(model, runs, batch_size)
+        print(f"{name:<10} {model_nbytes(model) / 1024 / 1024:>9.1f} {single:>11.1f} {batched:>11.1f}")
+
+    cosine = torch.nn.functional.cosine_similarity(outputs["ternary"].float(), outputs["packed"].float(), dim=-1)
+    print(f"packed 与 ternary 输出的余弦相似度: min={cosine.min().item():.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+测量 Flask 应用的启动耗时：导入全部路由蓝图所需的时间、导入后是否已经加载了 torch/faiss 等重量级依赖，
+以及显式预热（warm_up）加载检索模型的耗时。每一项都在独立的子进程中测量，避免模块缓存的影响。
+用法: python benchmarks/startup_benchmark.py [--warm-up]
+"""
+import sys
+import os
+import json
+import subprocess
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_MODULES = ("torch", "faiss", "transformers", "matplotlib", "cv2")
+
+
+def run_child(warm):
+    start = time.perf_counter()
+    from routes.user_routes import user_bp
+    from routes.album_routes import album_bp
+    from routes.photo_routes import photo_bp
+    imported = time.perf_counter()
+    result = {
+        "import_s": imported - start,
+        "heavy_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    if warm:
+        from services.retrieval_provider import warm_up
+        warm_up()
+        result["warm_up_s"] = time.perf_counter() - imported
+    print(json.dumps(result))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(len(sys.argv) > 2 and sys.argv[2] == "warm")
+        return
+    warm = "--warm-up" in sys.argv
+
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "warm" if warm else "cold"],
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"导入路由耗时: {result['import_s']:.2f}s")
+    print(f"导入后已加载的重量级依赖: {', '.join(result['heavy_loaded']) or '无'}")
+    if warm:
+        print(f"预热（加载检索模型）耗时: {result['warm_up_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+对比 TnLinear 两种模式下单条文本查询的 CPU 时间：
+  - per-forward: 每次 forward 都重新三值化权重（训练时的行为）
+  - frozen: 加载时三值化一次，之后只做普通的 linear（replace_linear(model, inference=True)）
+同时检查两种模式的输出是否一致。
+用法: python benchmarks/ternary_inference_benchmark.py [runs]
+"""
+import sys
+import os
+import time
+import statistics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from transformers import AutoModel
+
+from retrieval_model.utils.TnModules import replace_linear, freeze_tn_linear
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "retrieval_model", "utils", "my_saved_model")
+QUERIES = ["a dog running on the beach", "sunset over the mountains", "birthday cake with candles",
+           "a cat sleeping on the sofa", "people walking in the snow"]
+
+
+def measure(model, runs):
+    """返回每条查询的 CPU 时间（毫秒）列表以及最后一轮的输出"""
+    durations = []
+    outputs = None
+    with torch.no_grad():
+        for _ in range(runs):
+            for query in QUERIES:
+                start = time.process_time()
+                feature = model.encode(text=[query])
+                durations.append((time.process_time() - start) * 1000)
+        outputs = model.encode(text=QUERIES).cpu().numpy()
+    return durations, outputs
+
+
+def report(name, durations):
+    durations = sorted(durations)
+    print(f"{name:<12} mean={statistics.mean(durations):.1f}ms  p50={statistics.median(durations):.1f}ms  "
+          f"p95={durations[int(len(durations) * 0.95) - 1]:.1f}ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    torch.set_grad_enabled(False)
+
+    model = AutoModel.from_pretrained(MODEL_PATH, trust_remote_code=True).to(torch.device("cpu"))
+    replace_linear(model)
+    model.set_processor(MODEL_PATH)
+    model.eval()
+
+    # 预热
+    model.encode(text=QUERIES[:1])
+    before, before_outputs = measure(model, runs)
+
+    frozen = freeze_tn_linear(model)
+    model.encode(text=QUERIES[:1])
+    after, after_outputs = measure(model, runs)
+
+    print(f"TnLinear 层数: {frozen}，查询数: {len(before)}")
+    report("per-forward", before)
+    report("frozen", after)
+    print(f"加速比: {statistics.mean(before) / statistics.mean(after):.2f}x")
+    print(f"输出最大差异: {np.abs(before_outputs - after_outputs).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import threading
+import time
+from collections import deque
+
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errors
 
 # 数据库配置
 DB_CONFIG = {
@@ -10,19 +14,226 @@ DB_CONFIG = {
     'database': 'graph'
 }
 
+# 连接池配置
+DB_POOL_CONFIG = {
+    'pool_size': 8,  # 最大连接数
+    'checkout_timeout': 10,  # 等待空闲连接的最长时间（秒）
+    'pre_ping_idle_seconds': 5,  # 借出前对空闲超过该时间的连接执行 ping，失效则重连
+    'recycle_seconds': 3600,  # 连接存活超过该时间后重建，避免被服务端 wait_timeout 断开
+    'health_check_interval': 60,  # 后台健康检查的间隔（秒），检查空闲超过该时间的连接
+}
+
+
+class PoolTimeoutError(Error):
+    """
+    等待空闲连接超时
+    """
+    pass
+
+
+class ConnectionPool:
+    """
+    MySQL 连接池
+    连接以 autocommit 模式创建，每条语句自动提交，避免复用连接时读到旧的事务快照；
+    借出时对空闲较久的连接做 pre-ping，后台线程定期检查空闲连接并回收失效或过旧的连接。
+    """
+
+    def __init__(self, config, pool_size=8, checkout_timeout=10, pre_ping_idle_seconds=5,
+                 recycle_seconds=3600, health_check_interval=60):
+        self.config = config
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.pre_ping_idle_seconds = pre_ping_idle_seconds
+        self.recycle_seconds = recycle_seconds
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._in_use = {}  # id(conn) -> created_at
+        self._total = 0  # 已创建且未丢弃的连接数
+        self._cond = threading.Condition()
+
+        # 统计信息
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+        if health_check_interval:
+            thread = threading.Thread(target=self._health_check_loop, name="db-pool-health", daemon=True)
+            thread.start()
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.config, autocommit=True)
+        with self._cond:
+            self.created += 1
+        return conn
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def acquire(self):
+        """
+        借出一个连接，没有空闲连接且已达到 pool_size 时最多等待 checkout_timeout 秒
+        """
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    item = self._idle.pop()  # 后进先出，优先使用最近用过的连接
+                    break
+                if self._total < self.pool_size:
+                    self._total += 1
+                    item = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(msg=f"等待数据库连接超时（{self.checkout_timeout}s）")
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - start
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+        # 建立连接和 ping 都在锁外进行
+        try:
+            now = time.monotonic()
+            if item is None:
+                conn, created_at = self._connect(), now
+            else:
+                conn, created_at, last_used = item
+                expired = now - created_at > self.recycle_seconds
+                if expired or (now - last_used >= self.pre_ping_idle_seconds and not self._ping(conn)):
+                    self._close(conn)
+                    with self._cond:
+                        self.discarded += 1
+                    conn, created_at = self._connect(), now
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use[id(conn)] = created_at
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        归还连接。discard=True 时关闭该连接（例如执行出错、连接可能已失效）
+        """
+        with self._cond:
+            created_at = self._in_use.pop(id(conn), None)
+            if created_at is None:
+                return
+            if discard:
+                self._total -= 1
+                self.discarded += 1
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    def _health_check_loop(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            try:
+                self.health_check()
+            except Exception as e:
+                print(f"数据库连接池健康检查出错: {e}")
+
+    def health_check(self):
+        """
+        检查空闲超过 health_check_interval 的连接，丢弃失效或存活过久的连接
+        """
+        now = time.monotonic()
+        with self._cond:
+            stale = [item for item in self._idle if now - item[2] >= self.health_check_interval]
+            for item in stale:
+                self._idle.remove(item)
+                self._in_use[id(item[0])] = item[1]
+
+        for conn, created_at, last_used in stale:
+            healthy = now - created_at <= self.recycle_seconds and self._ping(conn)
+            self.release(conn, discard=not healthy)
+
+    def stats(self):
+        """
+        返回连接池统计信息，包括借出等待时间
+        """
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'total': self._total,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+                'wait_time_avg_ms': 1000 * self.wait_time_total / self.checkouts if self.checkouts else 0.0,
+                'wait_time_max_ms': 1000 * self.wait_time_max,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    获取全局连接池（第一次使用时创建）
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+    return _pool
+
+
+def get_pool_stats():
+    """
+    获取连接池统计信息
+    """
+    return get_pool().stats()
+
 
 def get_db_connection():
     """
-    获取数据库连接
+    从连接池获取数据库连接，用完后需调用 release_db_connection 归还
     """
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
+        return get_pool().acquire()
     except Error as e:
         print(f"数据库连接错误: {e}")
         return None
 
 
+def release_db_connection(conn, discard=False):
+    """
+    把连接归还给连接池
+    """
+    get_pool().release(conn, discard=discard)
+
+
 def db_init():
     """
     初始化数据库和表
@@ -73,9 +284,10 @@ def db_init():
             time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             album_id INT,
             user_id INT,
-            status INT DEFAULT 0,
+            status INT NOT NULL DEFAULT 0,
             FOREIGN KEY (album_id) REFERENCES albums(id) ON DELETE SET NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            CONSTRAINT chk_photos_status CHECK (status IN (0, 1, 2))
         )
         ''')
 
@@ -86,7 +298,7 @@ def db_init():
 
             if not status_exists:
                 print("添加 status 字段到 photos 表")
-                cursor.execute("ALTER TABLE photos ADD COLUMN status INT DEFAULT 0")
+                cursor.execute("ALTER TABLE photos ADD COLUMN status INT NOT NULL DEFAULT 0")
                 # 将现有照片的状态设置为0（正常状态）
                 cursor.execute("UPDATE photos SET status = 0 WHERE status IS NULL")
                 conn.commit()
@@ -108,12 +320,15 @@ def db_init():
 def execute_query(query, params=None, fetch=False):
     """
     执行SQL查询
+    连接从连接池借出，执行完归还；连接是 autocommit 模式，写操作不需要再单独 commit
     todo: change this to model
     """
     conn = get_db_connection()
     result = None
 
     if conn:
+        cursor = None
+        failed = False
         try:
             cursor = conn.cursor(dictionary=True)  # 创建一个游标对象 cursor，并通过 dictionary=True 设置返回的结果以字典形式表示
             cursor.execute(query, params or ())  # 执行 SQL 查询 query，并将参数 params 传递给查询。如果没有传递参数，则使用空元组 ()
@@ -121,15 +336,20 @@ def execute_query(query, params=None, fetch=False):
             if fetch:  # 判断是否需要获取查询结果
                 result = cursor.fetchall()  # 调用 cursor.fetchall() 获取所有查询结果，并将其赋值给 result
             else:
-                conn.commit()
-                result = cursor.lastrowid  # 调用 conn.commit() 提交事务（通常用于写操作，如插入、更新、删除），并将最后插入行的 ID (cursor.lastrowid) 赋值给 result
+                result = cursor.lastrowid  # 写操作（插入、更新、删除）已自动提交，将最后插入行的 ID (cursor.lastrowid) 赋值给 result
 
         except Error as e:
             print(f"查询执行错误: {e}")
+            # 连接层面的错误说明连接可能已经失效；SQL 语法、约束等错误不影响连接本身
+            failed = isinstance(e, (errors.OperationalError, errors.InterfaceError))
         finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    failed = True
+            # 失效的连接直接丢弃，其余归还给连接池
+            release_db_connection(conn, discard=failed)
 
     return result  # 返回查询结果或最后插入行的 ID
 
@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def upgrade(cursor):
+    """
+    为photos表添加status字段
+    0: 正常状态
+    1: 回收站
+    """
+    # 检查status字段是否已经存在
+    check_query = """
+    SELECT column_name 
+    FROM information_schema.columns 
+    WHERE table_schema = DATABASE() AND table_name='photos' AND column_name='status'
+    """
+    cursor.execute(check_query)
+    result = cursor.fetchall()
+
+    if result and len(result) > 0:
+        print("status字段已存在，跳过")
+        return
+
+    # 添加status字段，默认值为0（正常状态）
+    add_column_query = """
+    ALTER TABLE photos
+    ADD COLUMN status INTEGER DEFAULT 0
+    """
+    cursor.execute(add_column_query)
+
+    print("成功添加status字段")
+
+
+if __name__ == "__main__":
+    from migrations.runner import main
+    main(target=1)
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def upgrade(cursor):
+    """
+    一次性修复照片状态，并从表结构上禁止无效值
+    有效状态: 0(正常), 1(回收站), 2(封面)
+    之前 Photo.find_by_user / Photo.find_in_trash 每次读取前都会执行一次全表 UPDATE，
+    现在由这个迁移一次性完成，并通过 NOT NULL DEFAULT 0 和 CHECK 约束防止再出现无效值，
+    列表接口因此只需要读。
+    """
+    # 将所有 status 为 NULL 或无效值的照片设置为 0（正常状态）
+    fix_query = """
+    UPDATE photos
+    SET status = 0
+    WHERE status IS NULL OR status NOT IN (0, 1, 2)
+    """
+    cursor.execute(fix_query)
+    print(f"已修复 {cursor.rowcount} 条无效的status值")
+
+    # status 不允许为 NULL，默认值为 0
+    modify_query = """
+    ALTER TABLE photos
+    MODIFY COLUMN status INT NOT NULL DEFAULT 0
+    """
+    cursor.execute(modify_query)
+    print("status字段已设置为 NOT NULL DEFAULT 0")
+
+    # 检查约束只允许 0, 1, 2（MySQL 8.0.16 及以上才会真正执行 CHECK 约束）
+    check_query = """
+    SELECT constraint_name
+    FROM information_schema.table_constraints
+    WHERE table_schema = DATABASE() AND table_name = 'photos' AND constraint_name = 'chk_photos_status'
+    """
+    cursor.execute(check_query)
+    result = cursor.fetchall()
+    if result and len(result) > 0:
+        print("chk_photos_status约束已存在，跳过")
+        return
+
+    add_check_query = """
+    ALTER TABLE photos
+    ADD CONSTRAINT chk_photos_status CHECK (status IN (0, 1, 2))
+    """
+    cursor.execute(add_check_query)
+    print("成功添加chk_photos_status约束")
+
+
+if __name__ == "__main__":
+    from migrations.runner import main
+    main(target=2)
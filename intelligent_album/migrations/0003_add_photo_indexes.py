@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 索引名 -> 列
+# find_by_user / find_in_trash / get_recent / search_recent 按 (user_id, status) 过滤并按 time 排序；
+# find_by_ids / find_by_addresses 以及旧的 search* 按 (user_id, address) 查找；
+# find_by_album 按 (album_id, status) 过滤并按 time 排序。
+PHOTO_INDEXES = {
+    "idx_photos_user_status_time": "(user_id, status, time)",
+    "idx_photos_user_address": "(user_id, address)",
+    "idx_photos_album_status_time": "(album_id, status, time)",
+}
+
+
+def upgrade(cursor):
+    """
+    为 photos 表的列表和检索查询添加覆盖过滤和排序的复合索引
+    """
+    for name, columns in PHOTO_INDEXES.items():
+        check_query = """
+        SELECT index_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'photos' AND index_name = %s
+        """
+        cursor.execute(check_query, (name,))
+        if cursor.fetchall():
+            print(f"索引 {name} 已存在，跳过")
+            continue
+
+        cursor.execute(f"CREATE INDEX {name} ON photos {columns}")
+        print(f"成功添加索引 {name} {columns}")
+
+
+if __name__ == "__main__":
+    from migrations.runner import main
+    main(target=3)
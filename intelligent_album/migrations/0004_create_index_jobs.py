@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def upgrade(cursor):
+    """
+    创建 index_jobs 表：记录每张上传照片的后台建索引任务
+    status: pending（等待）、running（处理中）、done（完成）、failed（多次重试后失败）
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS index_jobs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        photo_id INT NOT NULL,
+        user_id INT NOT NULL,
+        file_path VARCHAR(512) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        claimed_by VARCHAR(64),
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_index_jobs_status (status, id),
+        INDEX idx_index_jobs_user_status (user_id, status),
+        INDEX idx_index_jobs_claimed_by (claimed_by),
+        FOREIGN KEY (photo_id) REFERENCES photos(id) ON DELETE CASCADE
+    )
+    """)
+    print("成功创建index_jobs表")
+
+
+if __name__ == "__main__":
+    from migrations.runner import main
+    main(target=4)
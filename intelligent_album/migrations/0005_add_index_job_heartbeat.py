@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def upgrade(cursor):
+    """
+    为 index_jobs 表添加 heartbeat_at 列：处理任务的工作线程定期刷新，
+    长时间没有刷新的 running 任务说明处理它的进程已经退出，会被放回等待队列
+    """
+    check_query = """
+    SELECT column_name
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'index_jobs' AND column_name = 'heartbeat_at'
+    """
+    cursor.execute(check_query)
+    if cursor.fetchall():
+        print("heartbeat_at 列已存在，跳过")
+        return
+
+    cursor.execute("ALTER TABLE index_jobs ADD COLUMN heartbeat_at TIMESTAMP NULL DEFAULT NULL")
+    cursor.execute("CREATE INDEX idx_index_jobs_status_heartbeat ON index_jobs (status, heartbeat_at)")
+    print("成功添加 index_jobs.heartbeat_at 列")
+
+
+if __name__ == "__main__":
+    from migrations.runner import main
+    main(target=5)
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.indexing_queue import sync_vector_metadata
+from services.retrieval_provider import get_retrieval_model
+
+FAISS_DEPEND_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "retrieval_model", "utils", "faiss_dependencies")
+
+
+def main():
+    """
+    为检索模型索引中元数据不完整的向量（元数据功能上线前建立的索引）从 photos 表补齐状态、图集和上传时间，
+    数据库中已经不存在的照片，其向量从索引中删除。
+    检索服务在运行时通过服务修改索引，否则在本进程中加载检索模型（修改时持有与 Web 进程相同的文件锁），
+    因此可以在应用运行时执行。
+    """
+    print("开始迁移：补齐检索索引的向量元数据...")
+
+    try:
+        if not os.path.exists(FAISS_DEPEND_ROOT):
+            print("没有找到检索索引目录，跳过")
+            return
+
+        retrieval_model = get_retrieval_model()
+        for user_id in sorted(os.listdir(FAISS_DEPEND_ROOT)):
+            if not os.path.isdir(os.path.join(FAISS_DEPEND_ROOT, user_id)):
+                continue
+            missing = len(retrieval_model.missing_metadata(user_id))
+            if missing == 0:
+                continue
+            if sync_vector_metadata(retrieval_model, user_id):
+                print(f"用户 {user_id}: 补齐 {missing} 个向量的元数据")
+            else:
+                print(f"用户 {user_id}: 查询数据库失败，请稍后重新运行")
+
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        sys.exit(1)
+
+    print("迁移完成！")
+
+
+if __name__ == "__main__":
+    main()
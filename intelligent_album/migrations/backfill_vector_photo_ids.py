@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import faiss
+
+from config.database import execute_query
+from retrieval_model.index_policy import IndexPolicy, l2_normalize
+
+FAISS_DEPEND_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "retrieval_model", "utils", "faiss_dependencies")
+
+
+def to_address(image_path, user_id):
+    """
+    把索引中保存的图片绝对路径转换成数据库中的相对路径（uploads/user_id/filename）
+    旧数据的绝对路径可能来自其他机器，因此只取文件名
+    """
+    return f"uploads/{user_id}/{os.path.basename(image_path)}"
+
+
+def backfill_user(user_id):
+    """
+    为单个用户的索引回填照片ID，返回回填的向量数量
+    """
+    user_dir = os.path.join(FAISS_DEPEND_ROOT, user_id)
+    embeddings_file = os.path.join(user_dir, "bgevl_embeddings.npy")
+    paths_file = os.path.join(user_dir, "bgevl_image_paths.txt")
+    ids_file = os.path.join(user_dir, "bgevl_photo_ids.npy")
+    index_file = os.path.join(user_dir, "faiss_index.faiss")
+
+    if not (os.path.exists(embeddings_file) and os.path.exists(paths_file)):
+        return 0
+
+    features = np.load(embeddings_file)
+    with open(paths_file, "r") as f:
+        image_paths = [line.strip() for line in f.readlines()]
+
+    if os.path.exists(ids_file):
+        ids = np.load(ids_file).astype(np.int64)
+    else:
+        ids = -np.arange(2, len(image_paths) + 2, dtype=np.int64)
+
+    rows = [row for row in range(len(ids)) if ids[row] < 0]
+    if not rows:
+        return 0
+
+    addresses = [to_address(image_paths[row], user_id) for row in rows]
+    placeholders = ", ".join(["%s"] * len(addresses))
+    query = f"SELECT id, address FROM photos WHERE user_id = %s AND address IN ({placeholders})"
+    records = execute_query(query, tuple([user_id] + addresses), fetch=True) or []
+    address_to_id = {record['address']: record['id'] for record in records}
+
+    filled = 0
+    for row, address in zip(rows, addresses):
+        if address in address_to_id:
+            ids[row] = address_to_id[address]
+            filled += 1
+
+    # 以照片ID为键重建索引（与检索模型相同的索引策略：向量归一化，内积度量，按数量选择索引类型）
+    features = l2_normalize(features)
+    index = IndexPolicy().build(features, ids)
+    faiss.write_index(index, index_file)
+    np.save(embeddings_file, features)
+    np.save(ids_file, ids)
+    return filled
+
+
+def main():
+    """
+    为检索模型索引中的旧向量回填照片ID（photos.id）
+    旧索引按行号与 bgevl_image_paths.txt 对齐，没有照片ID；
+    这里按图片路径在 photos 表中查找对应的ID，写入 bgevl_photo_ids.npy 并重建以ID为键的索引。
+    请在检索服务停止时运行。
+    """
+    print("开始迁移：为检索索引回填照片ID...")
+
+    try:
+        if not os.path.exists(FAISS_DEPEND_ROOT):
+            print("没有找到检索索引目录，跳过")
+            return
+
+        for user_id in sorted(os.listdir(FAISS_DEPEND_ROOT)):
+            if not os.path.isdir(os.path.join(FAISS_DEPEND_ROOT, user_id)):
+                continue
+            filled = backfill_user(user_id)
+            print(f"用户 {user_id}: 回填 {filled} 个照片ID")
+
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        sys.exit(1)
+
+    print("迁移完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import faiss
+
+from retrieval_model.index_policy import IndexPolicy, l2_normalize
+
+FAISS_DEPEND_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "retrieval_model", "utils", "faiss_dependencies")
+
+
+def renormalize_user(user_id, policy):
+    """
+    把单个用户的 bgevl_embeddings.npy 归一化为单位长度，并重建为内积（余弦）索引
+    已经是内积索引的用户跳过，返回处理的向量数量
+    """
+    user_dir = os.path.join(FAISS_DEPEND_ROOT, user_id)
+    embeddings_file = os.path.join(user_dir, "bgevl_embeddings.npy")
+    paths_file = os.path.join(user_dir, "bgevl_image_paths.txt")
+    ids_file = os.path.join(user_dir, "bgevl_photo_ids.npy")
+    index_file = os.path.join(user_dir, "faiss_index.faiss")
+
+    if not os.path.exists(embeddings_file):
+        return 0
+    if os.path.exists(index_file) and policy.metric_matches(faiss.read_index(index_file)):
+        return 0
+
+    features = l2_normalize(np.load(embeddings_file))
+    if os.path.exists(ids_file):
+        ids = np.load(ids_file).astype(np.int64)
+    else:
+        with open(paths_file, "r") as f:
+            count = len(f.readlines())
+        ids = -np.arange(2, count + 2, dtype=np.int64)
+        np.save(ids_file, ids)
+
+    index = policy.build(features, ids)
+    np.save(embeddings_file, features)
+    faiss.write_index(index, index_file)
+    return features.shape[0]
+
+
+def main():
+    """
+    一次性迁移：检索模型改为归一化向量 + 内积（余弦）索引后，
+    把已有的 bgevl_embeddings.npy 归一化，并把 L2 索引重建为内积索引。
+    检索服务加载到旧索引时也会自动完成同样的转换，这个脚本用于在停机时批量处理。
+    请在检索服务停止时运行。
+    """
+    print("开始迁移：归一化检索向量并重建内积索引...")
+
+    try:
+        if not os.path.exists(FAISS_DEPEND_ROOT):
+            print("没有找到检索索引目录，跳过")
+            return
+
+        policy = IndexPolicy()
+        for user_id in sorted(os.listdir(FAISS_DEPEND_ROOT)):
+            if not os.path.isdir(os.path.join(FAISS_DEPEND_ROOT, user_id)):
+                continue
+            count = renormalize_user(user_id, policy)
+            print(f"用户 {user_id}: 归一化 {count} 个向量")
+
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        sys.exit(1)
+
+    print("迁移完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import sys
+import os
+import re
+import importlib.util
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import get_db_connection, release_db_connection
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 迁移文件命名为 NNNN_name.py，NNNN 是版本号
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+
+def discover_migrations():
+    """
+    按版本号顺序返回 migrations 目录下的所有迁移 [(version, name, path)]
+    """
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"迁移版本号重复: {versions}")
+    return migrations
+
+
+def load_migration(path):
+    """
+    加载迁移模块（文件名以数字开头，不能直接 import）
+    """
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def upgrade(target=None):
+    """
+    按版本号顺序执行所有尚未执行的迁移（最多到 target 版本），返回本次执行的版本号列表
+    每个迁移执行成功后才会记录到 schema_migrations，失败时抛出异常并停止
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("无法连接数据库")
+
+    executed = []
+    failed = False
+    try:
+        cursor = conn.cursor(dictionary=True)
+        ensure_version_table(cursor)
+        done = applied_versions(cursor)
+
+        for version, name, path in discover_migrations():
+            if target is not None and version > target:
+                break
+            if version in done:
+                continue
+            print(f"执行迁移 {version:04d}_{name} ...")
+            load_migration(path).upgrade(cursor)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            executed.append(version)
+        cursor.close()
+    except Exception:
+        failed = True
+        raise
+    finally:
+        release_db_connection(conn, discard=failed)
+
+    return executed
+
+
+def status():
+    """
+    返回所有迁移及其是否已执行 [(version, name, applied)]
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise RuntimeError("无法连接数据库")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        ensure_version_table(cursor)
+        done = applied_versions(cursor)
+        cursor.close()
+    finally:
+        release_db_connection(conn)
+    return [(version, name, version in done) for version, name, _ in discover_migrations()]
+
+
+def main(target=None):
+    """
+    数据库迁移入口
+    python migrations/runner.py            执行所有未执行的迁移
+    python migrations/runner.py --status   查看迁移状态
+    python migrations/runner.py --target N 执行到版本 N 为止
+    """
+    args = sys.argv[1:]
+    if "--status" in args:
+        for version, name, applied in status():
+            print(f"{version:04d}_{name}: {'已执行' if applied else '未执行'}")
+        return
+    if "--target" in args:
+        target = int(args[args.index("--target") + 1])
+
+    print("开始数据库迁移...")
+    try:
+        executed = upgrade(target)
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        sys.exit(1)
+
+    if executed:
+        print(f"迁移完成！本次执行: {', '.join(f'{v:04d}' for v in executed)}")
+    else:
+        print("没有需要执行的迁移")
+
+
+if __name__ == "__main__":
+    main()
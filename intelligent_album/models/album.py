@@ -50,6 +50,30 @@ class Album:
         params = (user_id,)
         return execute_query(query, params, fetch=True)
 
+    @staticmethod
+    def find_by_user_with_counts(user_id, limit=None, offset=None):
+        """
+        查找用户的所有图集，并在同一条查询中带出每个图集的照片数量（photo_count）
+        照片数量用相关子查询统计，分页时只会统计当前页的图集（走 photos.album_id 上的外键索引）
+        """
+        query = """
+        SELECT a.*, (SELECT COUNT(*) FROM photos p WHERE p.album_id = a.id) AS photo_count
+        FROM albums a
+        WHERE a.user_id = %s
+        ORDER BY a.created_at DESC, a.id DESC
+        """
+        params = [user_id]
+
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+
+            if offset is not None:
+                query += " OFFSET %s"
+                params.append(offset)
+
+        return execute_query(query, tuple(params), fetch=True)
+
     @staticmethod
     def update(album_id, name=None, content=None, cover_url=None):
         """
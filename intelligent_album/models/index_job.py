@@ -0,0 +1,140 @@
+from config.database import execute_query
+import uuid
+
+
+class IndexJob:
+    """
+    照片的后台建索引任务
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, id=None, photo_id=None, user_id=None, file_path=None, status=PENDING, attempts=0,
+                 claimed_by=None, error=None, created_at=None, updated_at=None, heartbeat_at=None):
+        self.id = id
+        self.photo_id = photo_id
+        self.user_id = user_id
+        self.file_path = file_path
+        self.status = status
+        self.attempts = attempts
+        self.claimed_by = claimed_by
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.heartbeat_at = heartbeat_at
+
+    @staticmethod
+    def create(photo_id, user_id, file_path):
+        """
+        创建建索引任务
+        """
+        query = "INSERT INTO index_jobs (photo_id, user_id, file_path, status) VALUES (%s, %s, %s, %s)"
+        params = (photo_id, user_id, file_path, IndexJob.PENDING)
+
+        job_id = execute_query(query, params)
+        if job_id:
+            return {"success": True, "job_id": job_id}
+        else:
+            return {"success": False, "message": "创建索引任务失败"}
+
+    @staticmethod
+    def find_by_id(job_id):
+        """
+        通过ID查找任务
+        """
+        query = "SELECT * FROM index_jobs WHERE id = %s"
+        jobs = execute_query(query, (job_id,), fetch=True)
+
+        if jobs and len(jobs) > 0:
+            return jobs[0]
+        return None
+
+    @staticmethod
+    def count_by_status(user_id):
+        """
+        统计用户各状态的任务数量，返回 {status: count}
+        """
+        query = "SELECT status, COUNT(*) AS count FROM index_jobs WHERE user_id = %s GROUP BY status"
+        rows = execute_query(query, (user_id,), fetch=True) or []
+        counts = {IndexJob.PENDING: 0, IndexJob.RUNNING: 0, IndexJob.DONE: 0, IndexJob.FAILED: 0}
+        for row in rows:
+            counts[row['status']] = row['count']
+        return counts
+
+    @staticmethod
+    def claim_pending(limit):
+        """
+        原子地领取最多 limit 个等待中的任务（多个进程同时领取也不会领到同一个任务）
+        """
+        token = uuid.uuid4().hex
+        query = """
+        UPDATE index_jobs SET status = %s, claimed_by = %s, attempts = attempts + 1, heartbeat_at = NOW()
+        WHERE status = %s ORDER BY id LIMIT %s
+        """
+        execute_query(query, (IndexJob.RUNNING, token, IndexJob.PENDING, limit))
+
+        query = "SELECT * FROM index_jobs WHERE claimed_by = %s AND status = %s ORDER BY id"
+        return execute_query(query, (token, IndexJob.RUNNING), fetch=True) or []
+
+    @staticmethod
+    def heartbeat(job_ids):
+        """
+        刷新正在处理的任务的心跳时间，表示处理它的进程仍然存活
+        """
+        if not job_ids:
+            return {"success": True}
+        placeholders = ", ".join(["%s"] * len(job_ids))
+        query = f"UPDATE index_jobs SET heartbeat_at = NOW() WHERE status = %s AND id IN ({placeholders})"
+        execute_query(query, tuple([IndexJob.RUNNING] + list(job_ids)))
+        return {"success": True}
+
+    @staticmethod
+    def mark_done(job_ids, claimed_by):
+        """
+        把任务标记为完成
+        只更新仍由 claimed_by 领取的任务：任务超时后被放回队列、又被其他工作进程领取时，原来的进程不能覆盖它的状态
+        """
+        if not job_ids:
+            return {"success": True}
+        placeholders = ", ".join(["%s"] * len(job_ids))
+        query = f"UPDATE index_jobs SET status = %s, error = NULL WHERE claimed_by = %s AND id IN ({placeholders})"
+        execute_query(query, tuple([IndexJob.DONE, claimed_by] + list(job_ids)))
+        return {"success": True}
+
+    @staticmethod
+    def mark_failed(job_ids, claimed_by, error, max_attempts=3):
+        """
+        任务失败：重试次数未用完的放回等待队列，否则标记为失败（同样只更新仍由 claimed_by 领取的任务）
+        """
+        if not job_ids:
+            return {"success": True}
+        placeholders = ", ".join(["%s"] * len(job_ids))
+        query = f"""
+        UPDATE index_jobs SET status = IF(attempts >= %s, %s, %s), error = %s
+        WHERE claimed_by = %s AND id IN ({placeholders})
+        """
+        params = [max_attempts, IndexJob.FAILED, IndexJob.PENDING, error, claimed_by] + list(job_ids)
+        execute_query(query, tuple(params))
+        return {"success": True}
+
+    @staticmethod
+    def requeue_stale(stale_seconds=90, max_attempts=3):
+        """
+        把心跳超过 stale_seconds 秒没有刷新的 running 任务（处理它的进程已经退出）放回等待队列；
+        已经领取过 max_attempts 次的任务直接标记为失败，避免每次都让工作进程崩溃的图片被无限重试
+        仍在处理中的任务由工作进程定期刷新心跳，处理时间再长也不会被放回；
+        迁移前领取、没有心跳的任务按 updated_at 判断
+        """
+        query = """
+        UPDATE index_jobs
+        SET status = IF(attempts >= %s, %s, %s),
+            error = IF(attempts >= %s, %s, error),
+            claimed_by = NULL
+        WHERE status = %s AND COALESCE(heartbeat_at, updated_at) < NOW() - INTERVAL %s SECOND
+        """
+        params = (max_attempts, IndexJob.FAILED, IndexJob.PENDING, max_attempts, "处理任务的进程多次异常退出",
+                  IndexJob.RUNNING, stale_seconds)
+        execute_query(query, params)
+        return {"success": True}
@@ -1,6 +1,8 @@
 from config.database import execute_query
 # from intelligent_album.config.database import execute_query
 from datetime import datetime, timedelta
+import base64
+import json
 
 
 class Photo:
@@ -47,29 +49,63 @@ class Photo:
         return None
 
     @staticmethod
-    def find_by_user(user_id, limit=None, offset=None):
+    def find_by_user(user_id, limit=None, offset=None, cursor=None):
         """
         查找用户的所有正常照片（不包括回收站和封面的照片）
+        无效的状态已由迁移 migrations/0002_fix_photo_status.py 修复并受约束保护，这里只读
+        提供 cursor 时按游标分页（见 _find_by_status），忽略 offset
         """
-        # 首先修复任何无效的状态
-        Photo.fix_photo_status()
+        print(f"find_by_user: 查询用户 {user_id} 的正常照片")
+        return Photo._find_by_status(user_id, 0, limit, offset, cursor)
 
+    @staticmethod
+    def encode_cursor(photo):
+        """
+        用一条照片记录的 (time, id) 生成不透明的分页游标
+        """
+        payload = json.dumps({'t': photo['time'].isoformat(sep=' '), 'id': photo['id']})
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        解析分页游标，返回 (time, id)；游标无效时抛出 ValueError
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            return datetime.fromisoformat(payload['t']), int(payload['id'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+
+    @staticmethod
+    def _find_by_status(user_id, status, limit=None, offset=None, cursor=None):
+        """
+        按状态列出用户的照片，按 (time, id) 倒序排列
+        cursor 为上一页最后一条记录的游标时，使用 seek 条件 (time, id) < (cursor_time, cursor_id)
+        直接在 (user_id, status, time) 索引上定位到下一页，翻页代价与页数无关；
+        否则使用 LIMIT/OFFSET
+        """
         query = """
         SELECT * FROM photos 
-        WHERE user_id = %s AND status = 0 
-        ORDER BY time DESC
+        WHERE user_id = %s AND status = %s 
         """
-        params = [user_id]
+        params = [user_id, status]
+
+        if cursor:
+            cursor_time, cursor_id = Photo.decode_cursor(cursor)
+            query += " AND (time < %s OR (time = %s AND id < %s))"
+            params.extend([cursor_time, cursor_time, cursor_id])
+
+        query += " ORDER BY time DESC, id DESC"
 
         if limit is not None:
             query += " LIMIT %s"
             params.append(limit)
 
-            if offset is not None:
+            if offset is not None and not cursor:
                 query += " OFFSET %s"
                 params.append(offset)
 
-        print(f"find_by_user: 查询用户 {user_id} 的正常照片")
         print(f"执行查询: {query} 参数: {params}")
         result = execute_query(query, tuple(params), fetch=True)
         print(f"查询结果: 找到 {len(result) if result else 0} 条记录")
@@ -91,6 +127,7 @@ class Photo:
         修复所有照片的状态
         将所有 status 为 NULL 或无效值的照片设置为 0（正常状态）
         有效状态: 0(正常), 1(回收站), 2(封面)
+        这是全表写操作，不要在读路径上调用；日常修复请使用 migrations/0002_fix_photo_status.py
         """
         query = """
         UPDATE photos 
@@ -101,35 +138,13 @@ class Photo:
         return {"success": True, "message": "照片状态已修复"}
 
     @staticmethod
-    def find_in_trash(user_id, limit=None, offset=None):
+    def find_in_trash(user_id, limit=None, offset=None, cursor=None):
         """
         查找用户回收站中的照片（状态为1，不包括正常照片和封面照片）
+        提供 cursor 时按游标分页（见 _find_by_status），忽略 offset
         """
         print(f"find_in_trash: 查询用户 {user_id} 的回收站照片")
-
-        # 首先修复任何无效的状态
-        Photo.fix_photo_status()
-
-        query = """
-        SELECT * FROM photos 
-        WHERE user_id = %s AND status = 1 
-        ORDER BY time DESC
-        """
-        params = [user_id]
-
-        if limit is not None:
-            query += " LIMIT %s"
-            params.append(limit)
-
-            if offset is not None:
-                query += " OFFSET %s"
-                params.append(offset)
-
-        print(f"执行查询: {query} 参数: {params}")
-        result = execute_query(query, tuple(params), fetch=True)
-        print(f"查询结果: 找到 {len(result) if result else 0} 条记录")
-
-        return result
+        return Photo._find_by_status(user_id, 1, limit, offset, cursor)
 
     @staticmethod
     def update_status(photo_id, status):
@@ -247,6 +262,82 @@ class Photo:
         params = (user_id, addr, one_week_ago)
         return execute_query(query, params, fetch=True)
 
+    @staticmethod
+    def _view_condition(view):
+        """
+        返回视图对应的 SQL 筛选条件和参数
+        view: "all"（正常照片）、"trash"（回收站）、"recent"（最近一周的正常照片）
+        """
+        if view == 'trash':
+            return "status = 1", []
+        if view == 'recent':
+            one_week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+            return "status = 0 AND time >= %s", [one_week_ago]
+        return "status = 0", []
+
+    @staticmethod
+    def find_by_ids(user_id, photo_ids, view='all'):
+        """
+        按检索模型返回的照片ID批量查找照片，一次 WHERE id IN (...) 查询
+        结果按 photo_ids 的顺序（即检索排名）返回，不满足视图条件的照片会被过滤掉
+        """
+        if not photo_ids:
+            return []
+
+        condition, condition_params = Photo._view_condition(view)
+        placeholders = ", ".join(["%s"] * len(photo_ids))
+        query = f"SELECT * FROM photos WHERE user_id = %s AND {condition} AND id IN ({placeholders})"
+        params = [user_id] + condition_params + list(photo_ids)
+        records = execute_query(query, tuple(params), fetch=True) or []
+
+        by_id = {record['id']: record for record in records}
+        return [by_id[photo_id] for photo_id in dict.fromkeys(photo_ids) if photo_id in by_id]
+
+    @staticmethod
+    def find_by_addresses(user_id, addrs, view='all'):
+        """
+        按图片路径批量查找照片，一次 WHERE address IN (...) 查询
+        结果按 addrs 的顺序（即检索排名）返回，不满足视图条件的照片会被过滤掉
+        """
+        if not addrs:
+            return []
+
+        condition, condition_params = Photo._view_condition(view)
+        placeholders = ", ".join(["%s"] * len(addrs))
+        query = f"SELECT * FROM photos WHERE user_id = %s AND {condition} AND address IN ({placeholders})"
+        params = [user_id] + condition_params + list(addrs)
+        records = execute_query(query, tuple(params), fetch=True) or []
+
+        by_address = {}
+        for record in records:
+            by_address.setdefault(record['address'], []).append(record)
+        photos = []
+        seen = set()
+        for addr in addrs:
+            for record in by_address.get(addr, []):
+                if record['id'] not in seen:
+                    seen.add(record['id'])
+                    photos.append(record)
+        return photos
+
+    @staticmethod
+    def find_metadata(user_id, photo_ids):
+        """
+        批量查询照片的状态、图集和上传时间（不区分状态），用于同步检索模型中的向量元数据
+        返回 {photo_id, status, album_id, time} 字典列表，不存在的照片不返回；
+        查询出错（包括等待数据库连接超时）时返回 None，调用方不能把它当成"照片都不存在"
+        """
+        if not photo_ids:
+            return []
+
+        placeholders = ", ".join(["%s"] * len(photo_ids))
+        query = f"SELECT id, status, album_id, time FROM photos WHERE user_id = %s AND id IN ({placeholders})"
+        records = execute_query(query, tuple([user_id] + list(photo_ids)), fetch=True)
+        if records is None:
+            return None
+        return [{'photo_id': record['id'], 'status': record['status'], 'album_id': record['album_id'],
+                 'time': record['time']} for record in records]
+
     @staticmethod
     def get_recent(user_id, limit=20):
         """
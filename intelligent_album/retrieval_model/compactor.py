@@ -0,0 +1,43 @@
+import threading
+
+
+class IndexCompactor:
+    """
+    后台压缩线程。
+    删除图片时只在索引中留下墓碑，当某个用户的墓碑比例超过 threshold 时，
+    调用 schedule(user_id) 把该用户放入待压缩集合，由后台线程调用 compact_fn(user_id) 重建索引。
+    用户图库大小越过索引类型的阈值（见 index_policy.py）时，也通过 schedule 在后台迁移索引。
+    """
+
+    def __init__(self, compact_fn, threshold=0.2):
+        self.compact_fn = compact_fn
+        self.threshold = threshold
+        self.compactions = 0
+
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="index-compactor", daemon=True)
+        self._thread.start()
+
+    def should_compact(self, tombstone_ratio):
+        return tombstone_ratio >= self.threshold
+
+    def schedule(self, user_id):
+        """
+        把用户加入待压缩集合（重复调度同一个用户只会压缩一次）
+        """
+        with self._cond:
+            self._pending.add(str(user_id))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                user_id = self._pending.pop()
+            try:
+                self.compact_fn(user_id)
+                self.compactions += 1
+            except Exception as e:
+                print(f"压缩用户 {user_id} 的索引时出错: {e}")
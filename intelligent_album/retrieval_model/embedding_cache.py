@@ -0,0 +1,145 @@
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    查询文本 embedding 的 LRU 缓存。
+    键由模型标识和归一化后的查询文本组成，换模型（路径、量化方式、最大 token 数）后旧的缓存自然失效；
+    内存中最多保存 max_entries 条，超出后按最近最少使用淘汰。
+    可选的磁盘层（sqlite）在进程重启后仍然有效：内存未命中时先查磁盘，命中后再提升回内存。
+    """
+
+    def __init__(self, model_id, max_entries=1024, disk_path=None):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        model_id TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        dim INTEGER NOT NULL,
+                        embedding BLOB NOT NULL,
+                        PRIMARY KEY (model_id, query)
+                    )
+                """)
+
+    @staticmethod
+    def normalize(text):
+        """归一化查询文本：去掉首尾空白、合并连续空白、转小写"""
+        return re.sub(r"\s+", " ", text.strip()).lower()
+
+    @contextmanager
+    def _connect(self):
+        # sqlite 连接不能跨线程共享，每次操作单独打开；
+        # sqlite3.Connection 作为上下文管理器只负责提交/回滚，不会关闭连接，这里用完显式关闭
+        conn = sqlite3.connect(self.disk_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, text):
+        """
+        查找查询文本的 embedding，未命中返回 None
+        """
+        key = self.normalize(text)
+        with self._lock:
+            feature = self._entries.get(key)
+            if feature is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return feature
+
+        feature = self._disk_get(key)
+        with self._lock:
+            if feature is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, feature)
+        return feature
+
+    def put(self, text, feature):
+        """
+        保存查询文本的 embedding（内存，以及启用时的磁盘层）
+        """
+        key = self.normalize(text)
+        feature = np.asarray(feature, dtype=np.float32).reshape(-1)
+        feature.setflags(write=False)
+        with self._lock:
+            self._put_memory(key, feature)
+        self._disk_put(key, feature)
+
+    def _put_memory(self, key, feature):
+        self._entries[key] = feature
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key):
+        if not self.disk_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT dim, embedding FROM query_embeddings WHERE model_id = ? AND query = ?",
+                                   (self.model_id, key)).fetchone()
+        except sqlite3.Error as e:
+            print(f"query embedding cache: disk read failed: {e}")
+            return None
+        if row is None:
+            return None
+        feature = np.frombuffer(row[1], dtype=np.float32)
+        return feature if feature.shape[0] == row[0] else None
+
+    def _disk_put(self, key, feature):
+        if not self.disk_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO query_embeddings (model_id, query, dim, embedding) "
+                             "VALUES (?, ?, ?, ?)",
+                             (self.model_id, key, feature.shape[0], feature.tobytes()))
+        except sqlite3.Error as e:
+            print(f"query embedding cache: disk write failed: {e}")
+
+    def clear(self):
+        """
+        清空内存层，并删除磁盘层中属于当前模型的记录
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM query_embeddings WHERE model_id = ?", (self.model_id,))
+
+    def stats(self):
+        """
+        返回缓存的统计信息
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "disk_enabled": bool(self.disk_path),
+            }
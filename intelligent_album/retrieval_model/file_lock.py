@@ -0,0 +1,55 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能保证单进程内的互斥
+    fcntl = None
+
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+class FileLock:
+    """
+    基于 fcntl.flock 的跨进程互斥锁（锁文件不存在时自动创建）
+    每次 acquire 都打开一个新的文件描述符，同一进程中的不同线程之间同样互斥；不可重入，实例不要在线程间共享。
+    没有 fcntl 的平台上退化为进程内的锁。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        with _process_locks_guard:
+            self._thread_lock = _process_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+    def acquire(self, blocking=True):
+        """获取锁，blocking=False 时获取失败立即返回 False"""
+        if fcntl is None:
+            return self._thread_lock.acquire(blocking)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        if fcntl is None:
+            self._thread_lock.release()
+            return
+        fd, self._fd = self._fd, None
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,133 @@
+import math
+
+import faiss
+import numpy as np
+
+FLAT = "flat"
+HNSW = "hnsw"
+IVFPQ = "ivfpq"
+
+
+def l2_normalize(features):
+    """
+    把向量（一维）或矩阵的每一行归一化为单位长度，零向量保持不变
+    归一化后内积即余弦相似度
+    """
+    features = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(features, axis=-1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
+
+class IndexPolicy:
+    """
+    按用户图库大小选择索引类型：
+      - 少于 flat_max 张：精确的暴力搜索（IndexFlat），几十张图片时比 HNSW 更快也更准
+      - flat_max 到 hnsw_max 张：HNSW
+      - 超过 hnsw_max 张：OPQ + IVF-PQ，向量压缩到 pq_m 字节，内存远小于全精度 HNSW
+    所有类型都用 IndexIDMap2 包装，以照片ID为键。
+    向量在入库和查询时都已归一化，默认使用内积（即余弦相似度），分数越大越相似，可以直接按阈值过滤。
+    为避免图库大小在阈值附近来回变化时反复重建，降级（换成更小的索引类型）要求数量低于阈值的 downgrade_ratio 倍。
+    """
+
+    def __init__(self, flat_max=1000, hnsw_max=100000, hnsw_m=16, ef_construction=200, ef_search=50,
+                 pq_m=16, use_opq=True, nprobe=16, downgrade_ratio=0.8,
+                 metric=faiss.METRIC_INNER_PRODUCT):
+        self.flat_max = flat_max
+        self.hnsw_max = hnsw_max
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.use_opq = use_opq
+        self.nprobe = nprobe
+        self.downgrade_ratio = downgrade_ratio
+        self.metric = metric
+
+    def choose(self, n, current=None):
+        """
+        根据向量数量 n 选择索引类型；给出当前类型 current 时，降级需要越过带滞后的阈值
+        """
+        if n > self.hnsw_max:
+            return IVFPQ
+        if n > self.flat_max:
+            if current == IVFPQ and n > self.hnsw_max * self.downgrade_ratio:
+                return IVFPQ
+            return HNSW
+        if current == HNSW and n > self.flat_max * self.downgrade_ratio:
+            return HNSW
+        if current == IVFPQ and n > self.hnsw_max * self.downgrade_ratio:
+            return IVFPQ
+        return FLAT
+
+    @staticmethod
+    def kind_of(index):
+        """返回已有索引的类型（flat / hnsw / ivfpq）"""
+        base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(base, faiss.IndexHNSW):
+            return HNSW
+        if isinstance(base, faiss.IndexFlat):
+            return FLAT
+        return IVFPQ
+
+    def needs_migration(self, index, n):
+        """当前索引类型是否已经不适合 n 个向量"""
+        current = self.kind_of(index)
+        return self.choose(n, current) != current
+
+    def metric_matches(self, index):
+        """索引的度量方式是否与策略一致（旧索引使用 L2 距离）"""
+        return index.metric_type == self.metric
+
+    def _pq_m(self, dim):
+        # PQ 的子空间数必须整除维度
+        m = min(self.pq_m, dim)
+        while dim % m != 0:
+            m -= 1
+        return m
+
+    def _build_base(self, kind, dim, n):
+        if kind == FLAT:
+            return faiss.IndexFlat(dim, self.metric)
+        if kind == HNSW:
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, self.metric)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self.ef_search
+            return index
+        # 聚类中心数约为 4 * sqrt(n)，每个中心至少有 39 个训练样本（faiss 的建议下限）
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        m = self._pq_m(dim)
+        description = f"OPQ{m},IVF{nlist},PQ{m}" if self.use_opq else f"IVF{nlist},PQ{m}"
+        return faiss.index_factory(dim, description, self.metric)
+
+    def build(self, features, ids, kind=None):
+        """
+        为特征矩阵构建以照片ID为键的索引，kind 为空时按数量自动选择；特征为空时创建空的 flat 索引
+        """
+        dim = features.shape[1] if features.ndim == 2 else 512
+        n = features.shape[0]
+        kind = kind or self.choose(n)
+        if kind == IVFPQ and n == 0:
+            kind = FLAT
+
+        base = self._build_base(kind, dim, n)
+        index = faiss.IndexIDMap2(base)
+        if kind == IVFPQ:
+            index.train(np.ascontiguousarray(features, dtype=np.float32))
+            faiss.extract_index_ivf(base).nprobe = self.nprobe
+        if n > 0:
+            index.add_with_ids(features, ids)
+        return index
+
+    def describe(self, index):
+        """返回索引的类型和主要参数，用于统计接口"""
+        kind = self.kind_of(index)
+        info = {"type": kind, "ntotal": int(index.ntotal),
+                "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"}
+        base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if kind == HNSW:
+            info["efSearch"] = base.hnsw.efSearch
+        elif kind == IVFPQ:
+            ivf = faiss.extract_index_ivf(base)
+            info["nlist"] = ivf.nlist
+            info["nprobe"] = ivf.nprobe
+        return info
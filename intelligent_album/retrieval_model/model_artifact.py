@@ -0,0 +1,149 @@
+"""
+离线导出已经量化好的检索模型，服务启动时直接加载，不再在每次启动时读取完整的 HF checkpoint 并逐层量化。
+
+产物目录包含：
+  - model.safetensors: 量化后的全部参数和 buffer（packed 后端为 2 bit 打包权重），加载时以 mmap 方式读取
+  - artifact.json: 量化后端、分组大小、共享参数的别名
+  - 原模型目录中的配置、tokenizer、processor 和 remote code 文件
+用法: python retrieval_model/model_artifact.py <输出目录> [packed|ternary]
+"""
+import sys
+import os
+import json
+import shutil
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoConfig, AutoModel
+from safetensors.torch import save_file, load_file
+
+WEIGHTS_FILE = "model.safetensors"
+CONFIG_FILE = "artifact.json"
+BACKENDS = ("packed", "ternary")
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "utils", "my_saved_model")
+
+
+def _quantize(model, backend, group_size, quantize=True):
+    """
+    按后端替换模型中的 nn.Linear
+    quantize=False 时只替换结构（加载产物时权重随后从文件中读取）
+    """
+    if backend == "packed":
+        from retrieval_model.utils.PackedTnModules import replace_linear2packed
+        replace_linear2packed(model, group_size=group_size, quantize=quantize)
+    else:
+        from retrieval_model.utils.TnModules import replace_linear, TnLinear
+        replace_linear(model, inference=quantize)
+        if not quantize:
+            # 产物中保存的已经是三值化后的权重，不能再三值化一次
+            for module in model.modules():
+                if isinstance(module, TnLinear):
+                    module.frozen = True
+
+
+def _named_tensors(model):
+    """模型的全部参数和 buffer（包括非持久化 buffer），共享同一存储的张量只保留一份"""
+    tensors, aliases, seen = {}, {}, {}
+    named = list(model.named_parameters(remove_duplicate=False)) + list(model.named_buffers(remove_duplicate=False))
+    for name, tensor in named:
+        key = (tensor.data_ptr(), tensor.dtype, tuple(tensor.shape))
+        if key in seen:
+            aliases[name] = seen[key]
+            continue
+        seen[key] = name
+        tensors[name] = tensor.detach().contiguous().cpu()
+    return tensors, aliases
+
+
+def _set_tensor(model, name, tensor):
+    module_path, _, attr = name.rpartition(".")
+    module = model.get_submodule(module_path) if module_path else model
+    if attr in module._parameters:
+        module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+    else:
+        module._buffers[attr] = tensor
+
+
+def export_artifact(output_dir, backend="packed", model_path=DEFAULT_MODEL_PATH, group_size=-1):
+    """
+    读取 HF checkpoint，量化后写出产物目录
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {backend}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = AutoModel.from_pretrained(model_path, trust_remote_code=True).to(torch.device("cpu"))
+    model.eval()
+    _quantize(model, backend, group_size)
+
+    tensors, aliases = _named_tensors(model)
+    save_file(tensors, os.path.join(output_dir, WEIGHTS_FILE))
+
+    # 复制配置、tokenizer、processor 和 remote code，跳过原始权重
+    for filename in os.listdir(model_path):
+        source = os.path.join(model_path, filename)
+        if os.path.isfile(source) and not filename.endswith((".safetensors", ".bin", ".pt", ".pth")):
+            shutil.copy2(source, os.path.join(output_dir, filename))
+
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump({"backend": backend, "group_size": group_size, "aliases": aliases}, f, indent=2)
+    return os.path.join(output_dir, WEIGHTS_FILE)
+
+
+def is_artifact(path):
+    """path 是否为 export_artifact 导出的产物目录"""
+    return path is not None and os.path.exists(os.path.join(path, CONFIG_FILE)) \
+        and os.path.exists(os.path.join(path, WEIGHTS_FILE))
+
+
+def artifact_fingerprint(artifact_dir):
+    """
+    产物的标识：量化后端、分组大小以及权重文件的大小和修改时间，重新导出后标识随之变化
+    （用作查询 embedding 缓存等的模型标识，不需要读取整个权重文件计算哈希）
+    """
+    with open(os.path.join(artifact_dir, CONFIG_FILE), "r") as f:
+        artifact = json.load(f)
+    stat = os.stat(os.path.join(artifact_dir, WEIGHTS_FILE))
+    return f"{artifact['backend']}|group_size={artifact['group_size']}|{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def load_artifact(artifact_dir, device=None):
+    """
+    加载产物目录，返回量化后的模型（尚未 set_processor）
+    模型结构在 meta 设备上构建，不分配、也不随机初始化权重；权重直接指向 mmap 读取的张量
+    """
+    with open(os.path.join(artifact_dir, CONFIG_FILE), "r") as f:
+        artifact = json.load(f)
+
+    config = AutoConfig.from_pretrained(artifact_dir, trust_remote_code=True)
+    with torch.device("meta"):
+        model = AutoModel.from_config(config, trust_remote_code=True)
+        _quantize(model, artifact["backend"], artifact["group_size"], quantize=False)
+
+    tensors = load_file(os.path.join(artifact_dir, WEIGHTS_FILE), device="cpu")
+    for name, tensor in tensors.items():
+        _set_tensor(model, name, tensor)
+    for name, target in artifact["aliases"].items():
+        _set_tensor(model, name, tensors[target])
+
+    missing = [name for name, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise RuntimeError(f"artifact {artifact_dir} is missing tensors: {missing[:5]}")
+
+    if device is not None:
+        model = model.to(device)
+    return model.eval()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python retrieval_model/model_artifact.py <输出目录> [packed|ternary]")
+        sys.exit(1)
+    output_dir = sys.argv[1]
+    backend = sys.argv[2] if len(sys.argv) > 2 else "packed"
+    path = export_artifact(output_dir, backend=backend)
+    print(f"已导出 {backend} 模型: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+多语言查询编码：用本地的多语言句向量模型直接编码中文（或其他语言）查询，
+再通过一个线性投影映射到 BGE-VL 的向量空间，检索时不再需要先翻译成英文。
+
+投影矩阵通过蒸馏得到：对一批平行语料 (原文, 英文)，学生模型编码原文，BGE-VL 编码英文作为目标，
+用带岭回归的最小二乘求解 W、b，使 student(原文) @ W + b ≈ BGE-VL(英文)。
+teacher 与服务使用同一个编码器（services.retrieval_provider.encoder_kwargs），其标识保存在投影文件中，
+加载时与运行中的模型不一致（例如之后导出了量化模型产物）的投影会被拒绝，需要重新拟合。
+用法: python retrieval_model/multilingual.py <平行语料.tsv> <多语言模型路径> <投影输出路径.npz>
+      平行语料每行一条 "原文\t英文"
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+
+class MultilingualTextEncoder:
+    """
+    多语言文本编码器 + 到 BGE-VL 空间的线性投影
+    encode(texts) 返回 (n, dim) 的矩阵，与 RetrievalModel.extract_embeddings 的输出处于同一空间
+    """
+
+    def __init__(self, model_path, projection_path=None, device=None, max_length=64, teacher_id=None):
+        # teacher_id: 运行中的 BGE-VL 编码器标识（RetrievalModel.encoder_id），给出时只接受用它拟合的投影
+        self.model_path = model_path
+        self.max_length = max_length
+        self.teacher_id = teacher_id
+        self.device = device if device is not None else (
+            torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu"))
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModel.from_pretrained(model_path).to(self.device).eval()
+
+        self.weight = None
+        self.bias = None
+        if projection_path is not None:
+            self.load_projection(projection_path)
+
+    def load_projection(self, projection_path):
+        """加载 fit_projection 保存的投影矩阵，teacher 与 self.teacher_id 不一致时抛出 ValueError"""
+        teacher = projection_teacher(projection_path)
+        if self.teacher_id is not None and teacher != self.teacher_id:
+            raise ValueError(f"projection {projection_path} was fitted against {teacher}, "
+                             f"running encoder is {self.teacher_id}")
+        with np.load(projection_path) as projection:
+            self.weight = projection["weight"].astype(np.float32)
+            self.bias = projection["bias"].astype(np.float32)
+
+    def encode_raw(self, texts):
+        """
+        多语言模型自身的句向量（对 token 做 mean pooling），返回 (n, student_dim)
+        """
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                return_tensors="pt").to(self.device)
+        with torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return pooled.cpu().numpy().astype(np.float32)
+
+    def encode(self, texts):
+        """
+        编码查询文本并投影到 BGE-VL 空间，返回 (n, dim)
+        """
+        if self.weight is None:
+            raise RuntimeError("multilingual projection is not loaded")
+        return self.encode_raw(texts) @ self.weight + self.bias
+
+
+def projection_teacher(projection_path):
+    """返回投影文件中记录的 teacher 编码器标识，旧的投影文件没有记录时返回 None"""
+    with np.load(projection_path) as projection:
+        return str(projection["teacher"]) if "teacher" in projection.files else None
+
+
+def fit_projection(student_features, teacher_features, ridge=1e-2):
+    """
+    求解 student @ W + b ≈ teacher 的岭回归最小二乘解，返回 (W, b)
+    """
+    x = student_features.astype(np.float64)
+    y = teacher_features.astype(np.float64)
+    x_mean = x.mean(axis=0)
+    y_mean = y.mean(axis=0)
+    xc = x - x_mean
+    yc = y - y_mean
+    gram = xc.T @ xc + ridge * len(x) * np.eye(x.shape[1])
+    weight = np.linalg.solve(gram, xc.T @ yc)
+    bias = y_mean - x_mean @ weight
+    return weight.astype(np.float32), bias.astype(np.float32)
+
+
+def load_parallel_corpus(corpus_path):
+    """读取 "原文\t英文" 格式的平行语料"""
+    sources, targets = [], []
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 2 and parts[0] and parts[1]:
+                sources.append(parts[0])
+                targets.append(parts[1])
+    return sources, targets
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("用法: python retrieval_model/multilingual.py <平行语料.tsv> <多语言模型路径> <投影输出路径.npz>")
+        sys.exit(1)
+    corpus_path, student_path, output_path = sys.argv[1:4]
+
+    from retrieval_model.retrieval import RetrievalModel
+    from services.retrieval_provider import encoder_kwargs
+
+    sources, targets = load_parallel_corpus(corpus_path)
+    print(f"平行语料: {len(sources)} 条")
+
+    # 与服务使用同一个编码器，投影才会落在索引中图片向量所在的空间
+    teacher = RetrievalModel(**encoder_kwargs())
+    print(f"teacher: {teacher.encoder_id}")
+    student = MultilingualTextEncoder(student_path)
+
+    batch_size = 64
+    student_features, teacher_features = [], []
+    for start in range(0, len(sources), batch_size):
+        student_features.append(student.encode_raw(sources[start:start + batch_size]))
+        teacher_features.append(teacher.extract_embeddings(texts=targets[start:start + batch_size]))
+    student_features = np.concatenate(student_features)
+    teacher_features = np.concatenate(teacher_features)
+
+    # 留出 10% 评估对齐效果
+    split = max(1, int(len(sources) * 0.9))
+    weight, bias = fit_projection(student_features[:split], teacher_features[:split])
+    if split < len(sources):
+        predicted = student_features[split:] @ weight + bias
+        target = teacher_features[split:]
+        cosine = np.sum(predicted * target, axis=1) / (
+            np.linalg.norm(predicted, axis=1) * np.linalg.norm(target, axis=1) + 1e-9)
+        print(f"验证集余弦相似度: mean={cosine.mean():.4f} min={cosine.min():.4f}")
+
+    np.savez(output_path, weight=weight, bias=bias, teacher=np.array(teacher.encoder_id))
+    print(f"投影已保存到 {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SearchResultCache:
+    """
+    检索结果集缓存，键为 (user_id, 归一化查询文本, min_score)。
+    第一次查询时按 result_window 多取一段排名并缓存，翻页（"加载更多"）只是对已有排名切片，不再调用模型和索引；
+    用户索引发生变化（条目 version 改变）或超过 ttl_seconds 后缓存失效。
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, needed):
+        """
+        返回缓存的排名列表；缓存不存在、已过期、索引已变化，或缓存的排名不够 needed 条（且排名未取完）时返回 None
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                cached_version, ranking, complete, created = cached
+                if cached_version == version and time.time() - created <= self.ttl_seconds \
+                        and (complete or len(ranking) >= needed):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return ranking
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, ranking, complete):
+        """
+        保存排名列表；complete 表示排名已经包含全部结果（再往后取也不会有更多）
+        """
+        with self._lock:
+            self._entries[key] = (version, ranking, complete, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        返回缓存的统计信息
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -3,14 +3,19 @@ import numpy as np
 import torch
 import faiss
 from transformers import AutoTokenizer, AutoModel
-import matplotlib
 from datetime import datetime
-
-matplotlib.use("Agg")  # 根据环境选择后端
-import matplotlib.pyplot as plt
-import cv2
 import time
 import textwrap
+from contextlib import contextmanager
+
+from retrieval_model.user_cache import UserIndexCache, UserIndexEntry
+from retrieval_model.file_lock import FileLock
+from retrieval_model.compactor import IndexCompactor
+from retrieval_model.text_batcher import TextEncodeBatcher
+from retrieval_model.embedding_cache import QueryEmbeddingCache
+from retrieval_model.index_policy import IndexPolicy, l2_normalize
+from retrieval_model.result_cache import SearchResultCache
+from retrieval_model.vector_metadata import VectorMetadata
 
 
 class RetrievalModel:
@@ -18,11 +23,37 @@ class RetrievalModel:
                  model_path=os.path.join(os.path.dirname(__file__), "utils", "my_saved_model"),
                  quantized=True,
                  use_bitblas=False,
+                 use_packed=False,
+                 artifact_path=None,
                  max_token_length=77,
-                 device=None):
+                 device=None,
+                 cache_max_bytes=1024 * 1024 * 1024,
+                 compact_threshold=0.2,
+                 text_batch_size=16,
+                 text_batch_wait_ms=5,
+                 query_cache_size=1024,
+                 query_cache_path=None,
+                 multilingual_model_path=None,
+                 multilingual_projection_path=None,
+                 index_policy=None,
+                 result_window=100,
+                 filter_brute_force_max=4096):
         """
         初始化检索模型，包括加载预训练模型、tokenizer、以及相关路径参数
-        不加载或构建 embeddings、paths、index 及 annotations。
+        不加载或构建 embeddings、paths、index 及 annotations，它们在每个用户第一次使用时加载进 self.cache。
+        param:
+            - use_packed: 量化模式下在 CPU 上使用 2 bit 打包的三值权重（PackedTnLinear），内存约为 fp32 的 1/16
+            - artifact_path: model_artifact.py 导出的已量化模型目录，存在时直接加载，跳过 checkpoint 读取和逐层量化
+            - cache_max_bytes: 用户索引缓存的内存预算（字节），超出后按 LRU 淘汰
+            - compact_threshold: 删除产生的墓碑比例超过该阈值时，后台重建该用户的索引
+            - text_batch_size / text_batch_wait_ms: 并发文本查询的动态批处理参数（每批最多条数 / 最长等待毫秒数）
+            - query_cache_size: 查询文本 embedding 的 LRU 缓存条数
+            - query_cache_path: 查询 embedding 磁盘缓存（sqlite 文件）的路径，None 表示只用内存缓存
+            - multilingual_model_path / multilingual_projection_path: 多语言文本编码器及其到 BGE-VL 空间的投影，
+              两者都提供时，文本查询直接用多语言编码器编码，不需要先翻译成英文
+            - index_policy: 按用户图库大小选择索引类型（flat / HNSW / IVF-PQ）的策略，默认 IndexPolicy()
+            - result_window: 文本查询第一次检索时取回并缓存的排名长度，翻页在这个范围内不再重新检索
+            - filter_brute_force_max: 按视图筛选检索时，满足条件的向量不超过该数量则直接在子集上精确计算
         """
         if not quantized:
             # model_path = "BAAI/BGE-VL-base"
@@ -42,26 +73,77 @@ class RetrievalModel:
             torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu"))
 
         # 加载模型和 tokenizer
-        self.model = AutoModel.from_pretrained(self.model_path, trust_remote_code=True).to(self.device)
+        self.use_artifact = False
+        if quantized and artifact_path is not None:
+            from retrieval_model.model_artifact import is_artifact
+            self.use_artifact = is_artifact(artifact_path)
+        if self.use_artifact:
+            from retrieval_model.model_artifact import load_artifact, artifact_fingerprint
+            self.model_path = artifact_path
+            artifact_id = artifact_fingerprint(artifact_path)
+            self.model = load_artifact(artifact_path, device=self.device)
+        else:
+            self.model = AutoModel.from_pretrained(self.model_path, trust_remote_code=True).to(self.device)
 
         # bitblas加速
         self.use_bitblas = use_bitblas
-        if quantized:
+        self.use_packed = use_packed
+        if quantized and not self.use_artifact:
             if self.use_bitblas:
                 from retrieval_model.utils.BitBlasModules import replace_linear2bitblas
                 replace_linear2bitblas(self.model)
+            elif self.use_packed:
+                from retrieval_model.utils.PackedTnModules import replace_linear2packed
+                replace_linear2packed(self.model)
             else:
                 from retrieval_model.utils.TnModules import replace_linear
-                replace_linear(self.model)
+                # 只做推理，加载时三值化一次
+                replace_linear(self.model, inference=True)
         self.model.set_processor(self.model_path)
         self.model.eval()
+        # 编码器的标识：产物按其后端、分组大小和权重文件区分，重新导出后标识随之变化
+        if self.use_artifact:
+            self.encoder_id = f"artifact={artifact_id}|tokens={max_token_length}"
+        else:
+            self.encoder_id = (f"{os.path.basename(self.model_path)}|quantized={quantized}|bitblas={use_bitblas}"
+                               f"|packed={use_packed}|tokens={max_token_length}")
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, trust_remote_code=True)
 
-        # 初始化annotations, features,image_paths和index. 都是空字典。键是user_id，值是相应utils
-        self.annotations = {}
-        self.features = {}
-        self.image_paths = {}
-        self.index = {}
+        # 每个用户的索引类型随图库大小变化，越过阈值时由后台线程迁移
+        self.index_policy = index_policy if index_policy is not None else IndexPolicy()
+        # 每个用户的 annotations, features, image_paths 和 index 常驻在 LRU 缓存中，键是user_id
+        self.cache = UserIndexCache(max_bytes=cache_max_bytes)
+        # 删除只打墓碑，由后台线程按阈值压缩
+        self.compactor = IndexCompactor(self.compact, threshold=compact_threshold)
+        # 多语言查询编码器（可选）
+        self.multilingual_encoder = None
+        if multilingual_model_path is not None and multilingual_projection_path is not None:
+            from retrieval_model.multilingual import MultilingualTextEncoder, projection_teacher
+            teacher = projection_teacher(multilingual_projection_path)
+            if teacher == self.encoder_id:
+                self.multilingual_encoder = MultilingualTextEncoder(multilingual_model_path,
+                                                                    multilingual_projection_path,
+                                                                    device=self.device, teacher_id=self.encoder_id)
+            else:
+                # 投影落在另一个编码器的空间中，检索效果会悄悄变差；退回翻译后编码
+                print(f"多语言投影是用 {teacher} 拟合的，与当前编码器 {self.encoder_id} 不一致，"
+                      f"不启用多语言查询，请重新运行 retrieval_model/multilingual.py 拟合投影")
+        # 并发的纯文本查询合并成一批做前向传播
+        self.text_batcher = TextEncodeBatcher(self.extract_query_embeddings,
+                                              max_batch_size=text_batch_size,
+                                              max_wait_ms=text_batch_wait_ms)
+        # 热门查询直接命中缓存，不再经过模型；模型标识变化时缓存自动失效
+        model_id = f"{self.encoder_id}|normalized"
+        if self.multilingual_encoder is not None:
+            # 重新拟合投影后查询向量也会变化
+            projection_stat = os.stat(multilingual_projection_path)
+            model_id += (f"|multilingual={os.path.basename(os.path.normpath(multilingual_model_path))}"
+                         f"|projection={projection_stat.st_size}-{projection_stat.st_mtime_ns}")
+        self.query_cache = QueryEmbeddingCache(model_id, max_entries=query_cache_size, disk_path=query_cache_path)
+        # 每个用户、每个查询的排名结果，翻页时直接切片
+        self.result_window = result_window
+        self.filter_brute_force_max = filter_brute_force_max
+        self.result_cache = SearchResultCache()
         '''
         # 加载 annotations（如果文件存在），否则初始化空字典
         if os.path.exists(self.annotations_file):
@@ -158,7 +240,7 @@ class RetrievalModel:
         return annotations
 
     def extract_embedding(self, image_path=None, text=None):
-        """提取单个文本、图片或混合输入的 embedding"""
+        """提取单个文本、图片或混合输入的 embedding（已归一化为单位长度）"""
         with torch.no_grad():
             try:
                 feature = self.model.encode(images=image_path, text=text)
@@ -167,7 +249,41 @@ class RetrievalModel:
                 feature = None
         if feature is None:
             return None
-        return feature.cpu().numpy().astype(np.float32).flatten()
+        return l2_normalize(feature.cpu().numpy().astype(np.float32).flatten())
+
+    def extract_embeddings(self, image_paths=None, texts=None):
+        """
+        批量提取多张图片（及其文本）的 embedding，一次前向传播处理整个 batch
+        返回每行已归一化的 (n, dim) 矩阵，失败时返回 None
+        """
+        n = len(image_paths) if image_paths is not None else len(texts)
+        with torch.no_grad():
+            try:
+                features = self.model.encode(images=image_paths, text=texts)
+            except Exception as e:
+                print(f"Error in batched model.encode: {e}")
+                features = None
+        if features is None:
+            return None
+        return l2_normalize(features.cpu().numpy().astype(np.float32).reshape(n, -1))
+
+    @property
+    def multilingual(self):
+        """是否使用多语言编码器编码文本查询（此时查询不需要翻译）"""
+        return self.multilingual_encoder is not None
+
+    def extract_query_embeddings(self, texts):
+        """
+        批量编码纯文本查询，返回 (n, dim) 的矩阵，失败时返回 None
+        启用多语言编码器时直接编码原文，否则用 BGE-VL 的文本编码器（要求输入为英文）
+        """
+        if self.multilingual_encoder is None:
+            return self.extract_embeddings(texts=texts)
+        try:
+            return l2_normalize(self.multilingual_encoder.encode(texts))
+        except Exception as e:
+            print(f"Error in multilingual encode: {e}")
+            return None
 
     def build_hnsw_index(self, features, ef_construction=200, ef_search=50, M=16):
         """使用 FAISS 构建 HNSW 索引"""
@@ -187,6 +303,12 @@ class RetrievalModel:
             print("results is None")
             return None
 
+        # matplotlib 和 cv2 只在可视化时用到，延迟导入以加快服务启动
+        import matplotlib
+        matplotlib.use("Agg")  # 根据环境选择后端
+        import matplotlib.pyplot as plt
+        import cv2
+
         save_path = os.path.join(os.path.dirname(__file__), "retrieval_results", f"{user_id}")
         if not os.path.exists(save_path):
             os.makedirs(save_path)
@@ -209,7 +331,7 @@ class RetrievalModel:
         plt.text(0.5, 0.5, wrap_text(query_text), fontsize=12, ha="center", va="center")
         plt.axis("off")
         # 显示 Top-K 结果
-        for i, (img_path, caption, score) in enumerate(results[:k]):
+        for i, (img_path, caption, score, photo_id) in enumerate(results[:k]):
             img = cv2.imread(img_path)
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             plt.subplot(2, k, k + i + 1)
@@ -227,63 +349,183 @@ class RetrievalModel:
         plt.savefig(save_path)
         plt.show()
 
-    def search(self, user_id, query_feature, k=5):
+    def search(self, user_id, query_feature, k=5, min_score=None, selector=None):
         """
-        在索引中搜索最近的 k 个邻居，返回 (image_path, caption, distance) 列表
-        使用类中已加载的 self.index, self.image_paths 及 self.annotations
+        在索引中搜索最相似的 k 个结果，返回 (image_path, caption, score, photo_id) 列表，按 score 从高到低排列
+        score 是查询向量与图片向量的余弦相似度（[-1, 1]，越大越相似），不同查询之间可以用同一个阈值比较；
+        给出 min_score 时，遇到第一个低于阈值的结果即停止（结果已按分数排序，后面的只会更低）。
+        selector 为向量元数据的筛选条件（见 vector_metadata.view_selector），返回的是满足条件的照片中的 top-k：
+          - 满足条件的向量不超过 filter_brute_force_max 个时，直接在这个子集上精确计算
+          - 否则在索引中按满足条件的比例多取候选，不够时加倍重取
+        使用缓存中该用户的 index, image_paths 及 annotations
+        索引直接返回照片ID，通过 id_to_row 找到对应的行；
+        已删除（墓碑）的行不在 id_to_row 中，会被过滤掉，因此按墓碑数量多取一些候选；
+        不支持 remove_ids 的索引（HNSW）中，同一照片重新加入后可能有多个向量共用一个ID，只保留分数最高的一个。
+        旧数据中没有照片ID的向量（占位ID为负数）返回的 photo_id 为 None
         """
-        self.check_dependencies(user_id)
+        entry = self.check_dependencies(user_id)
 
         if query_feature is None:
             print("query_feature is None")
             return None
-        query_feature = query_feature.reshape(1, -1)
-        D, I = self.index[user_id].search(query_feature, k)
+        query_feature = l2_normalize(query_feature.reshape(1, -1))
+        with entry.lock:
+            mask = None
+            if selector:
+                mask = entry.metadata.mask(selector)
+                if entry.deleted:
+                    mask[list(entry.deleted)] = False
+                matched = int(mask.sum())
+                if matched == 0:
+                    return []
+                if matched <= self.filter_brute_force_max:
+                    return self._search_subset(entry, query_feature[0], np.nonzero(mask)[0], k, min_score)
+
+            ntotal = entry.index.ntotal
+            fetch_k = min(k + len(entry.deleted), ntotal)
+            if mask is not None:
+                # 按满足条件的比例估算需要的候选数
+                fetch_k = min(int(np.ceil(fetch_k * ntotal / matched * 1.5)), ntotal)
+            while True:
+                if fetch_k <= 0:
+                    return []
+                D, I = entry.index.search(query_feature, fetch_k)
+                results = []
+                seen = set()
+                below_threshold = False
+                for score, label in zip(D[0], I[0]):
+                    if label == -1:
+                        break
+                    if min_score is not None and score < min_score:
+                        below_threshold = True
+                        break
+                    if label in seen:
+                        continue
+                    seen.add(label)
+                    row = entry.id_to_row.get(int(label))
+                    if row is None or (mask is not None and not mask[row]):
+                        continue
+                    results.append(self._result(entry, row, score))
+                    if len(results) >= k:
+                        break
+                if len(results) >= k or below_threshold or fetch_k >= ntotal or mask is None:
+                    return results
+                fetch_k = min(fetch_k * 2, ntotal)
+
+    def _search_subset(self, entry, query_feature, rows, k, min_score=None):
+        """在给定的行上精确计算余弦相似度，返回 top-k（调用方持有 entry.lock）"""
+        scores = entry.features[rows] @ query_feature
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
         results = []
-        for dist, idx in zip(D[0], I[0]):
-            if idx == -1:
+        for i in top:
+            if min_score is not None and scores[i] < min_score:
                 break
-            print(dist, idx)
-            image_path = self.image_paths[user_id][idx]
-            caption = self.annotations[user_id].get(image_path, "No annotation")
-            results.append((image_path, caption, dist))
+            results.append(self._result(entry, rows[i], scores[i]))
         return results
 
-    def query(self, user_id, text_input=None, image_address=None, top_k=5):
+    @staticmethod
+    def _result(entry, row, score):
+        image_path = entry.image_paths[row]
+        caption = entry.annotations.get(image_path, "No annotation")
+        photo_id = int(entry.ids[row]) if entry.ids[row] >= 0 else None
+        return image_path, caption, float(score), photo_id
+
+    def query(self, user_id, text_input=None, image_address=None, top_k=5, min_score=None, offset=0, selector=None):
         """
         搜索api
         执行查询：
-          1. 使用类中保存的 annotations、embeddings、paths、index
+          1. 使用缓存中保存的 annotations、embeddings、paths、index
           2. 对输入进行混合查询，并可视化结果
-        返回： (query_text, query_image, results)
+        参数：
+            top_k: 返回的结果数量
+            min_score: 余弦相似度阈值，低于阈值的结果不返回
+            offset: 从排名的第几个结果开始返回，用于翻页
+            selector: 向量元数据的筛选条件（见 vector_metadata.view_selector），只在满足条件的照片中排名
+        纯文本查询的排名按 result_window 多取一段并缓存在 result_cache 中，翻页时直接切片，不再编码和检索
+        返回： results[offset:offset + top_k]
         """
-        self.check_dependencies(user_id)
+        entry = self.check_dependencies(user_id)
 
         start_time = time.time()
         query_text = text_input
         query_image = image_address
-        # 获取输入的特征
-        query_feature = self.extract_embedding(image_path=query_image, text=query_text)
+        needed = offset + top_k
+        cache_key = None
+        if query_image is None and query_text is not None:
+            # "最近" 视图的起始时间每次都在变，按分钟取整，避免结果集缓存永远不命中
+            selector_key = None
+            if selector:
+                selector_key = tuple(sorted((name, value // 60 * 60 if name == "since" else value)
+                                            for name, value in selector.items()))
+            cache_key = (str(user_id), self.query_cache.normalize(query_text), min_score, selector_key)
+            ranking = self.result_cache.get(cache_key, entry.version, needed)
+            if ranking is not None:
+                return ranking[offset:needed]
+
+        # 获取输入的特征，纯文本查询先查缓存，再经过动态批处理
+        if query_image is None and query_text is not None:
+            query_feature = self.encode_query_text(query_text)
+        else:
+            query_feature = self.extract_embedding(image_path=query_image, text=query_text)
 
         if query_feature is None:
             print("query_feature is None")
             return None
 
         # 根据特征检索
-        results = self.search(user_id, query_feature, k=top_k)
-        # self.visualize_results(user_id, query_image, query_text, results, annotations=self.annotations[user_id],k=top_k)
+        version = entry.version
+        depth = max(needed, self.result_window)
+        results = self.search(user_id, query_feature, k=depth, min_score=min_score, selector=selector)
+        if cache_key is not None:
+            self.result_cache.put(cache_key, version, results, complete=len(results) < depth)
+        # self.visualize_results(user_id, query_image, query_text, results, annotations=entry.annotations,k=top_k)
         end_time = time.time()
         print(f"time: {end_time - start_time:.2f}s")
-        print(results)
         # return query_text, query_image, results
-        return results
+        return results[offset:needed]
 
-    def add_image(self, user_id, new_image_path, caption_text=""):
+    def find_similar(self, user_id, photo_id=None, image_path=None, top_k=5, min_score=None, selector=None):
+        """
+        以图搜图：直接用索引中已保存的该照片的向量检索，不需要重新解码图片或做前向传播
+        照片按 photo_id 查找，旧数据（没有照片ID）按 image_path 查找；结果中不包含照片本身
+        返回 (image_path, caption, score, photo_id) 列表；照片不在索引中时返回 None
+        """
+        entry = self.check_dependencies(user_id)
+        with entry.lock:
+            row = entry.id_to_row.get(int(photo_id)) if photo_id is not None else None
+            if row is None and image_path is not None:
+                row = entry.path_to_row.get(image_path)
+            if row is None:
+                return None
+            feature = entry.features[row].copy()
+            self_path = entry.image_paths[row]
+
+        results = self.search(user_id, feature, k=top_k + 1, min_score=min_score, selector=selector)
+        return [item for item in results if item[0] != self_path][:top_k]
+
+    def encode_query_text(self, text):
+        """
+        编码纯文本查询：先查查询 embedding 缓存，未命中时交给动态批处理编码并写回缓存
+        失败时返回 None
+        """
+        query_feature = self.query_cache.get(text)
+        if query_feature is not None:
+            return query_feature
+        query_feature = self.text_batcher.encode(text)
+        if query_feature is not None:
+            self.query_cache.put(text, query_feature)
+        return query_feature
+
+    def add_image(self, user_id, new_image_path, caption_text="", photo_id=None):
         """
         增加图片api
         接收user_id参数，根据user_id确定操作路径和faiss依赖
         将用户输入的图片和文本标注添加到目标文件夹和注释文件中，
-        同时更新 self.annotations、self.features、self.image_paths 和 self.index，
+        同时更新缓存中该用户的 annotations、features、image_paths 和 index，
         避免每次都重新加载。
         新图片文件来自参数，都是路径。
         返回更新后的 (features, image_paths)
@@ -291,16 +533,8 @@ class RetrievalModel:
             - user_id: 用户id
             - new_image_path: 新增图片的路径（格式为~/uploads/user_id/xxx.jpg）,详见photo_routes.py中upload_photo函数
             - caption_text: 图片注释。大概率没有，因为用户不会输入这个……
+            - photo_id: 图片在数据库中的ID（photos.id），作为向量在索引中的键
         """
-        # 确保各个依赖变量已经正常初始化
-        self.check_dependencies(user_id)
-
-        faiss_depend_dir = os.path.join(self.faiss_depend_root, f"{user_id}")
-        index_file = os.path.join(faiss_depend_dir, "faiss_index.faiss")
-        embeddings_file = os.path.join(faiss_depend_dir, "bgevl_embeddings.npy")
-        paths_file = os.path.join(faiss_depend_dir, "bgevl_image_paths.txt")
-        annotations_file = os.path.join(faiss_depend_dir, "annotations.txt")
-
         # 这些工作photo_routes.py已经干了
         '''
         if not os.path.exists(target_dir):
@@ -320,191 +554,498 @@ class RetrievalModel:
             print(f"复制图片时出错: {e}")
             return None, None
         '''
-        # 写入新的标注（格式：文件名#0 标注）
-        # 不从文件名构建caption_text
-        # caption_text = os.path.splitext(os.path.basename(new_image_path))[0]
-        annotation_line = f"{new_image_path}#0 {caption_text}\n"
-        try:
-            with open(annotations_file, "a", encoding="utf-8") as f:
-                f.write(annotation_line)
-            print("注释已添加。")
-        except Exception as e:
-            print(f"写入注释文件时出错: {e}")
+        added, failed = self.add_images(user_id, [new_image_path], captions=[caption_text],
+                                        photo_ids=None if photo_id is None else [photo_id])
+        if not added:
             return None, None
 
-        # 更新 self.annotations（字典映射文件名到标注）
-        self.annotations[user_id][new_image_path] = caption_text
-        print(f"annotations for {user_id}: ", len(self.annotations[user_id]))
-
-        # 更新 self.image_paths
-        self.image_paths[user_id].append(new_image_path)
-
-        # 提取新图片的特征向量
-        new_feature = self.extract_embedding(image_path=new_image_path, text=caption_text)
-        if new_feature is None:
-            print("提取特征失败")
-            return None, None
-        new_feature = new_feature.reshape(1, -1)
+        entry = self.check_dependencies(user_id)
+        return entry.features, entry.image_paths
 
-        # 如果维度不匹配，则报错（确保之前构建时使用的维度一致）
-        if self.features[user_id].size > 0 and self.features[user_id].shape[1] != new_feature.shape[1]:
-            print(
-                f"维度不匹配: self.features[{user_id}].shape = {self.features[user_id].shape}, new_feature.shape = {new_feature.shape}")
-            return None, None
-
-        # 更新 self.features
-        if self.features[user_id].size == 0:
-            self.features[user_id] = new_feature
-        else:
-            self.features[user_id] = np.vstack([self.features[user_id], new_feature])
+    def add_images(self, user_id, new_image_paths, captions=None, photo_ids=None, batch_size=32, metadata=None):
+        """
+        批量增加图片api
+        按 batch_size 分批：每批图片一次前向传播提取特征，一次性追加到索引，每批只写一次磁盘文件
+        param:
+            - user_id: 用户id
+            - new_image_paths: 新增图片的路径列表
+            - captions: 与 new_image_paths 一一对应的注释列表（可选，默认全为空字符串）
+            - photo_ids: 与 new_image_paths 一一对应的照片ID列表（可选，不提供时使用负数占位ID）
+            - batch_size: 每批处理的图片数量
+            - metadata: 与 new_image_paths 一一对应的元数据字典列表（status、album_id、time，可选），用于按视图筛选检索
+        返回 (added, failed)：成功加入索引的图片路径列表和失败的图片路径列表
+        """
+        if captions is None:
+            captions = [""] * len(new_image_paths)
+        if len(captions) != len(new_image_paths):
+            raise ValueError("captions 与 new_image_paths 的长度不一致")
+        if photo_ids is None:
+            photo_ids = [None] * len(new_image_paths)
+        if len(photo_ids) != len(new_image_paths):
+            raise ValueError("photo_ids 与 new_image_paths 的长度不一致")
+        if metadata is None:
+            metadata = [None] * len(new_image_paths)
+        if len(metadata) != len(new_image_paths):
+            raise ValueError("metadata 与 new_image_paths 的长度不一致")
+
+        added, failed = [], []
+        for start in range(0, len(new_image_paths), batch_size):
+            batch_paths = list(new_image_paths[start:start + batch_size])
+            batch_captions = list(captions[start:start + batch_size])
+            batch_ids = list(photo_ids[start:start + batch_size])
+            batch_meta = list(metadata[start:start + batch_size])
+
+            # 先提取特征，失败时不改动任何内存或磁盘状态
+            batch_features = self.extract_embeddings(image_paths=batch_paths, texts=batch_captions)
+            if batch_features is None:
+                # 整批失败时逐张重试，找出无法解码的图片
+                ok_paths, ok_captions, ok_ids, ok_meta, ok_features = [], [], [], [], []
+                for path, caption, photo_id, meta in zip(batch_paths, batch_captions, batch_ids, batch_meta):
+                    feature = self.extract_embedding(image_path=path, text=caption)
+                    if feature is None:
+                        print(f"提取特征失败: {path}")
+                        failed.append(path)
+                        continue
+                    ok_paths.append(path)
+                    ok_captions.append(caption)
+                    ok_ids.append(photo_id)
+                    ok_meta.append(meta)
+                    ok_features.append(feature)
+                if not ok_features:
+                    continue
+                batch_paths, batch_captions, batch_ids, batch_meta = ok_paths, ok_captions, ok_ids, ok_meta
+                batch_features = np.stack(ok_features)
 
-        print(f"features for {user_id}: ", self.features[user_id])
+            if self._append_features(user_id, batch_paths, batch_captions, batch_ids, batch_features, batch_meta):
+                added.extend(batch_paths)
+            else:
+                failed.extend(batch_paths)
 
-        # 更新 FAISS 索引
-        self.index[user_id].add(new_feature)
-        faiss.write_index(self.index[user_id], index_file)
-        print(f"index for {user_id}: ", self.index[user_id])
+        print(f"新图片已成功添加: {len(added)} 张, 失败: {len(failed)} 张")
+        return added, failed
 
-        # 更新磁盘文件
-        np.save(embeddings_file, self.features[user_id])
-        with open(paths_file, "w") as f:
-            for path in self.image_paths[user_id]:
-                f.write(path + "\n")
-        print(f"paths for {user_id}: ", len(self.image_paths[user_id]))
-
-        print("新图片及标注已成功添加。")
-        return self.features[user_id], self.image_paths[user_id]
+    def _append_features(self, user_id, image_paths, captions, photo_ids, features, metadata=None):
+        """
+        把一批已经提取好的特征追加到用户的缓存条目和索引中，并写回一次磁盘
+        同一个照片ID重复加入时（例如重新建立索引），旧的行会先被记为墓碑
+        """
+        # 确保各个依赖变量已经正常初始化，并且与磁盘上的文件一致
+        with self._locked_entry(user_id) as (entry, files):
+            # 如果维度不匹配，则报错（确保之前构建时使用的维度一致）
+            if entry.features.size > 0 and entry.features.shape[1] != features.shape[1]:
+                print(
+                    f"维度不匹配: features[{user_id}].shape = {entry.features.shape}, new_features.shape = {features.shape}")
+                return False
+
+            # 写入新的标注（格式：文件名#0 标注）
+            # 不从文件名构建caption_text
+            # caption_text = os.path.splitext(os.path.basename(new_image_path))[0]
+            try:
+                with open(files["annotations"], "a", encoding="utf-8") as f:
+                    for path, caption in zip(image_paths, captions):
+                        f.write(f"{path}#0 {caption}\n")
+                print("注释已添加。")
+            except Exception as e:
+                print(f"写入注释文件时出错: {e}")
+                return False
+
+            # 没有照片ID的图片使用负数占位ID（-1 是 faiss 的空结果标记，从 -2 开始）
+            ids = []
+            next_placeholder = min(int(entry.ids.min()) if entry.ids.size > 0 else 0, -1) - 1
+            for photo_id in photo_ids:
+                if photo_id is None:
+                    ids.append(next_placeholder)
+                    next_placeholder -= 1
+                else:
+                    ids.append(int(photo_id))
+            ids = np.array(ids, dtype=np.int64)
+
+            # 同一照片重新加入时（包括删除后再加入），旧的向量从索引中移除，旧的行记为墓碑
+            reindexed = ids[np.isin(ids, entry.ids)]
+            if reindexed.size > 0:
+                self._remove_vectors(entry.index, reindexed)
+            for photo_id in ids:
+                old_row = entry.id_to_row.pop(int(photo_id), None)
+                if old_row is not None:
+                    entry.deleted.add(old_row)
+                    entry.path_to_row.pop(entry.image_paths[old_row], None)
+
+            # 更新 annotations（字典映射文件名到标注）、image_paths 和 ids
+            for path, caption, photo_id in zip(image_paths, captions, ids):
+                entry.annotations[path] = caption
+                entry.path_to_row[path] = len(entry.image_paths)
+                entry.id_to_row[int(photo_id)] = len(entry.image_paths)
+                entry.image_paths.append(path)
+            entry.ids = np.concatenate([entry.ids, ids])
+            entry.metadata.append(metadata or [None] * len(image_paths))
+
+            # 更新 features
+            if entry.features.size == 0:
+                entry.features = features
+            else:
+                entry.features = np.vstack([entry.features, features])
+
+            # 更新 FAISS 索引
+            entry.index.add_with_ids(features, ids)
+            entry.bump_version()
+            print(f"index for {user_id}: ", entry.index)
+
+            # 更新磁盘文件
+            self._save_dependencies(entry, files)
+            print(f"paths for {user_id}: ", len(entry.image_paths))
+            migrate = self.index_policy.needs_migration(entry.index, entry.live_count())
+
+        self.cache.update(user_id)
+        if migrate:
+            # 图库大小越过阈值，后台重建为新类型的索引
+            self.compactor.schedule(user_id)
+        return True
 
-    def delete_image(self, user_id, image_path):
+    def delete_image(self, user_id, image_path=None, photo_id=None):
         """
         删除图片api
-        删除指定 image_path 对应的图片文件及其相关信息：
-         - 从 self.image_paths 中删除该路径
-         - 从 self.features 中删除对应的特征向量行
-         - 从 self.annotations 字典中删除对应条目
-         - 重建 FAISS 索引并更新磁盘文件：embeddings_file、paths_file 和 annotations_file
+        删除指定 photo_id（或 image_path）对应的图片在检索模型中的信息：
+         - 通过 id_to_row / path_to_row 在 O(1) 时间内找到对应的行，只把该行记为墓碑
+         - 检索时过滤墓碑，features、image_paths 和索引中的行在压缩前保持不动
+         - 墓碑比例超过阈值时，交给后台线程压缩（重建索引并重写磁盘文件）
         参数：
             user_id: 用户id
             image_path: 要删除的图片文件的绝对路径
+            photo_id: 要删除的图片在数据库中的ID，优先使用
         返回 True 表示成功，否则返回 False
         """
-        # 确保各个依赖变量已经正常初始化
-        self.check_dependencies(user_id)
+        # 确保各个依赖变量已经正常初始化，并且与磁盘上的文件一致
+        with self._locked_entry(user_id) as (entry, files):
+            idx = None
+            if photo_id is not None:
+                idx = entry.id_to_row.get(int(photo_id))
+            if idx is None and image_path is not None:
+                idx = entry.path_to_row.get(image_path)
+            if idx is None:
+                print(f"图片 {photo_id or image_path} 不存在于系统中。")
+                return False
+            image_path = entry.image_paths[idx]
+            entry.path_to_row.pop(image_path, None)
+            entry.id_to_row.pop(int(entry.ids[idx]), None)
+
+            # 删除磁盘上的图片文件（可选）-- 这个工作photo_routes_model.py已经干了
+            '''
+            try:
+                os.remove(entry.image_paths[idx])
+                print(f"已删除磁盘中的文件 {entry.image_paths[idx]}")
+            except Exception as e:
+                print(f"删除磁盘文件时出错: {e}")
+            '''
 
-        faiss_depend_dir = os.path.join(self.faiss_depend_root, f"{user_id}")
-        index_file = os.path.join(faiss_depend_dir, "faiss_index.faiss")
-        embeddings_file = os.path.join(faiss_depend_dir, "bgevl_embeddings.npy")
-        paths_file = os.path.join(faiss_depend_dir, "bgevl_image_paths.txt")
-        annotations_file = os.path.join(faiss_depend_dir, "annotations.txt")
-        # 在 self.image_paths 中找到对应的索引
-        idx = None
-        for i, path in enumerate(self.image_paths[user_id]):
-            if path == image_path:
-                idx = i
-                break
-        if idx is None:
-            print(f"图片 {image_path} 不存在于系统中。")
-            return False
+            entry.deleted.add(idx)
+            entry.annotations.pop(image_path, None)
+            entry.bump_version()
+            # 只需要写回墓碑文件，其余文件在压缩时重写
+            self._save_tombstones(entry, files)
+            self._write_generation(entry, files)
+            ratio = entry.tombstone_ratio()
+            migrate = self.index_policy.needs_migration(entry.index, entry.live_count())
+            print(f"after delete, live paths for {user_id}: {entry.live_count()}, tombstone ratio: {ratio:.2f}")
+
+        if self.compactor.should_compact(ratio) or migrate:
+            self.compactor.schedule(user_id)
+        print(f"图片 {image_path} 已被删除。")
+        return True
 
-        # 删除磁盘上的图片文件（可选）-- 这个工作photo_routes_model.py已经干了
-        '''
+    def compact(self, user_id):
+        """
+        压缩用户索引：去掉所有墓碑行，重建 FAISS 索引并重写磁盘文件。
+        图库大小越过 index_policy 的阈值时也通过这里迁移到新的索引类型。
+        重建在锁外进行，重建期间如果条目又被修改（包括被其他进程修改后重新加载），则在锁内重新构建一次。
+        """
+        entry = self.check_dependencies(user_id)
+
+        with entry.lock:
+            if not entry.deleted and not self.index_policy.needs_migration(entry.index, entry.live_count()):
+                return
+            version = entry.version
+            keep = [row for row in range(len(entry.image_paths)) if row not in entry.deleted]
+            features = entry.features[keep]
+            ids = entry.ids[keep]
+            image_paths = [entry.image_paths[row] for row in keep]
+
+        index = self._build_user_index(features, ids)
+
+        with self._locked_entry(user_id) as (current, files):
+            if current is not entry or current.version != version:
+                # 重建期间有新的增删，基于最新状态重新构建
+                entry = current
+                keep = [row for row in range(len(entry.image_paths)) if row not in entry.deleted]
+                features = entry.features[keep]
+                ids = entry.ids[keep]
+                image_paths = [entry.image_paths[row] for row in keep]
+                index = self._build_user_index(features, ids)
+            # 元数据在重建期间可能被 set_metadata 修改，在锁内取最新值
+            metadata = entry.metadata.take(keep)
+
+            entry.features = features
+            entry.ids = ids
+            entry.image_paths = image_paths
+            entry.metadata = metadata
+            entry.index = index
+            entry.deleted = set()
+            entry.rebuild_lookups()
+            entry.annotations = {path: text for path, text in entry.annotations.items() if path in entry.path_to_row}
+            entry.bump_version()
+            self._save_dependencies(entry, files, annotations=True)
+
+        self.cache.update(user_id)
+        print(f"用户 {user_id} 的索引已压缩，剩余 {len(image_paths)} 张图片，索引类型 {self.index_policy.kind_of(index)}。")
+
+    @staticmethod
+    def _remove_vectors(index, ids):
+        """
+        从索引中移除这些照片ID的向量，避免同一ID下出现多个向量；
+        HNSW 不支持 remove_ids，旧向量留到压缩时去掉，检索时按ID去重
+        """
         try:
-            os.remove(self.image_paths[user_id][idx])
-            print(f"已删除磁盘中的文件 {self.image_paths[user_id][idx]}")
-        except Exception as e:
-            print(f"删除磁盘文件时出错: {e}")
-        '''
+            index.remove_ids(np.ascontiguousarray(ids, dtype=np.int64))
+        except RuntimeError as e:
+            print(f"索引不支持移除向量，等待压缩时重建: {e}")
 
-        # 删除对应的特征向量行
-        print(f"before delete, features for {user_id}: ", self.features[user_id])
-        self.features[user_id] = np.delete(self.features[user_id], idx, axis=0)
-        print(f"after delete, features for {user_id}: ", self.features[user_id])
-        # 删除对应的路径
-        print(f"before delete, paths for {user_id}: ", len(self.image_paths[user_id]))
-        del self.image_paths[user_id][idx]
-        print(f"after delete, paths for {user_id}: ", len(self.image_paths[user_id]))
-
-        # 删除 self.annotations 中对应的条目
-        print(f"before delete, annotations for {user_id}: ", len(self.annotations[user_id]))
-        if image_path in self.annotations[user_id]:
-            del self.annotations[user_id][image_path]
-        print(f"after delete, annotations for {user_id}: ", len(self.annotations[user_id]))
-
-        # 重新构建 FAISS 索引（如果剩余特征不为空，否则创建空索引）
-        print(f"before delete, index for {user_id}: ", self.index[user_id])
-        if self.features[user_id].shape[0] > 0:
-            self.index[user_id] = self.build_hnsw_index(self.features[user_id])
-        else:
-            dim = self.features[user_id].shape[1] if self.features[user_id].size > 0 else 512
-            self.index[user_id] = faiss.IndexHNSWFlat(dim, 32)
-        faiss.write_index(self.index[user_id], index_file)
-        print(f"after delete, index for {user_id}: ", self.index[user_id])
-
-        # 更新磁盘文件：embeddings_file 和 paths_file
-        np.save(embeddings_file, self.features[user_id])
-        with open(paths_file, "w") as f:
-            for path in self.image_paths[user_id]:
-                f.write(path + "\n")
-
-        # 更新 annotations_file（重写所有条目）
-        with open(annotations_file, "w", encoding="utf-8") as f:
-            for file_path, annotation in self.annotations[user_id].items():
-                f.write(f"{file_path}#0 {annotation}\n")
+    def _build_user_index(self, features, ids):
+        """
+        为用户的特征矩阵构建以照片ID为键的索引（IndexIDMap2 包装），索引类型由 index_policy 按数量选择，
+        特征为空时创建空索引
+        """
+        return self.index_policy.build(features, ids)
 
-        print(f"图片 {image_path} 已被删除，并更新所有相关文件。")
-        return True
+    def set_metadata(self, user_id, records):
+        """
+        更新向量元数据（照片状态变化、移动图集或从数据库补齐旧数据时调用）
+        records: 字典列表，每个字典包含 photo_id 以及需要修改的 status / album_id / time
+        返回更新的行数；不在索引中的照片会被忽略
+        """
+        updated = 0
+        with self._locked_entry(user_id) as (entry, files):
+            for record in records:
+                row = entry.id_to_row.get(int(record["photo_id"]))
+                if row is None:
+                    continue
+                entry.metadata.set_row(row, record)
+                updated += 1
+            if updated:
+                # 让结果集缓存失效
+                entry.bump_version()
+                entry.metadata.save(files["metadata"])
+                self._write_generation(entry, files)
+        return updated
+
+    def missing_metadata(self, user_id):
+        """返回元数据还不完整的照片ID列表（旧数据），由调用方从数据库补齐"""
+        entry = self.check_dependencies(user_id)
+        with entry.lock:
+            return [int(entry.ids[row]) for row in entry.metadata.unknown_rows()
+                    if row not in entry.deleted and entry.ids[row] >= 0]
+
+    def get_index_info(self, user_id):
+        """返回用户当前的索引类型、向量数量（含墓碑）和有效向量数量"""
+        entry = self.check_dependencies(user_id)
+        with entry.lock:
+            info = self.index_policy.describe(entry.index)
+            info["live"] = entry.live_count()
+            info["recommended"] = self.index_policy.choose(entry.live_count(), info["type"])
+        return info
 
     def get_all_image_annotation_pairs(self, user_id):
         """返回一个包含所有 (图片地址, 标注信息) 的列表"""
-        self.check_dependencies(user_id)
-        return [(image_path, self.annotations[user_id].get(image_path, "No annotation"))
-                for image_path in self.image_paths[user_id]]
+        entry = self.check_dependencies(user_id)
+        with entry.lock:
+            return [(image_path, entry.annotations.get(image_path, "No annotation"))
+                    for row, image_path in enumerate(entry.image_paths) if row not in entry.deleted]
+
+    def get_cache_stats(self):
+        """返回用户索引缓存的统计信息（加载次数、命中次数、淘汰次数、内存占用、后台压缩次数）"""
+        stats = self.cache.stats()
+        stats["compactions"] = self.compactor.compactions
+        stats["text_batching"] = self.text_batcher.stats()
+        stats["query_cache"] = self.query_cache.stats()
+        stats["result_cache"] = self.result_cache.stats()
+        return stats
+
+    def dependency_files(self, user_id):
+        """
+        返回用户 faiss 依赖文件的路径
+        """
+        faiss_depend_dir = os.path.join(self.faiss_depend_root, f"{user_id}")
+        return {
+            "dir": faiss_depend_dir,
+            "index": os.path.join(faiss_depend_dir, "faiss_index.faiss"),
+            "embeddings": os.path.join(faiss_depend_dir, "bgevl_embeddings.npy"),
+            "paths": os.path.join(faiss_depend_dir, "bgevl_image_paths.txt"),
+            "annotations": os.path.join(faiss_depend_dir, "annotations.txt"),
+            "tombstones": os.path.join(faiss_depend_dir, "tombstones.npy"),
+            "ids": os.path.join(faiss_depend_dir, "bgevl_photo_ids.npy"),
+            "metadata": os.path.join(faiss_depend_dir, "vector_metadata.npz"),
+            # 每次写回后更新的版本标记，其他进程据此发现内存中的条目已经过期
+            "generation": os.path.join(faiss_depend_dir, "generation"),
+            # 跨进程的写锁，加载和修改依赖文件时持有
+            "lock": os.path.join(faiss_depend_dir, "dependencies.lock"),
+        }
+
+    def _save_dependencies(self, entry, files, annotations=False):
+        """
+        把内存中的条目写回磁盘。annotations 文件通常是追加写入的，只有删除时才需要整体重写
+        """
+        faiss.write_index(entry.index, files["index"])
+        np.save(files["embeddings"], entry.features)
+        np.save(files["ids"], entry.ids)
+        with open(files["paths"], "w") as f:
+            for path in entry.image_paths:
+                f.write(path + "\n")
+        if annotations:
+            with open(files["annotations"], "w", encoding="utf-8") as f:
+                for file_path, annotation in entry.annotations.items():
+                    f.write(f"{file_path}#0 {annotation}\n")
+        entry.metadata.save(files["metadata"])
+        self._save_tombstones(entry, files)
+        self._write_generation(entry, files)
+
+    def _save_tombstones(self, entry, files):
+        """写回墓碑（已删除但尚未压缩的行号）"""
+        np.save(files["tombstones"], np.array(sorted(entry.deleted), dtype=np.int64))
+
+    @staticmethod
+    def _read_generation(files):
+        """读取磁盘上依赖文件的版本标记，旧数据没有标记时返回 None"""
+        try:
+            with open(files["generation"], "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_generation(entry, files):
+        """其余文件写完后最后更新版本标记（先写临时文件再替换，读到的标记总是完整的）"""
+        generation = f"{os.getpid()}-{time.time_ns()}"
+        tmp_file = files["generation"] + ".tmp"
+        with open(tmp_file, "w") as f:
+            f.write(generation)
+        os.replace(tmp_file, files["generation"])
+        entry.generation = generation
+
+    @contextmanager
+    def _locked_entry(self, user_id):
+        """
+        修改用户依赖时使用：持有跨进程的写锁和条目锁，并保证得到的条目与磁盘上的文件一致
+        （多个 Flask 工作进程各自加载模型时，另一个进程的增删不会被本进程的写回覆盖）
+        产出 (entry, files)
+        """
+        files = self.dependency_files(user_id)
+        while True:
+            # 加载本身也要获取写锁，所以先在锁外取得条目，再在锁内确认它没有过期
+            entry = self.check_dependencies(user_id)
+            file_lock = FileLock(files["lock"])
+            file_lock.acquire()
+            entry.lock.acquire()
+            if self.cache.peek(user_id) is entry and entry.generation == self._read_generation(files):
+                break
+            entry.lock.release()
+            file_lock.release()
+            self.cache.invalidate(user_id, entry)
+        try:
+            yield entry, files
+        finally:
+            entry.lock.release()
+            file_lock.release()
 
     def check_dependencies(self, user_id):
         """
         检查各个依赖变量是否初始化
+        已在缓存中的用户直接返回缓存条目，否则从磁盘加载（文件不存在时创建空的依赖）；
+        缓存的条目与磁盘上的版本标记不一致（文件被其他进程修改过）时丢弃并重新加载
+        返回该用户的 UserIndexEntry
+        """
+        entry = self.cache.get(user_id, self._load_dependencies_locked)
+        files = self.dependency_files(user_id)
+        with entry.lock:
+            # 本进程的写回在持有 entry.lock 时更新标记，这里不会把本进程的修改误判为过期
+            stale = entry.generation != self._read_generation(files)
+        if stale:
+            self.cache.invalidate(user_id, entry)
+            entry = self.cache.get(user_id, self._load_dependencies_locked)
+        return entry
+
+    def _load_dependencies_locked(self, user_id):
+        """持有跨进程写锁加载，避免读到其他进程写了一半的文件"""
+        files = self.dependency_files(user_id)
+        os.makedirs(files["dir"], exist_ok=True)
+        with FileLock(files["lock"]):
+            return self._load_dependencies(user_id)
+
+    def _load_dependencies(self, user_id):
+        """
+        从磁盘加载用户的 annotations, embeddings, image_paths 和 index，
+        文件不存在时创建空的依赖文件
         """
-        print("--------------check dependencies---------------")
+        print("--------------load dependencies---------------")
         # 检查相册路径
         target_dir = os.path.join(self.photo_root, f"{user_id}")  # 根据user_id确定目标路径
         os.makedirs(target_dir, exist_ok=True)
 
         # 检查依赖路径
-        faiss_depend_dir = os.path.join(self.faiss_depend_root, f"{user_id}")
-        os.makedirs(faiss_depend_dir, exist_ok=True)
-        index_file = os.path.join(faiss_depend_dir, "faiss_index.faiss")
-        embeddings_file = os.path.join(faiss_depend_dir, "bgevl_embeddings.npy")
-        paths_file = os.path.join(faiss_depend_dir, "bgevl_image_paths.txt")
-        annotations_file = os.path.join(faiss_depend_dir, "annotations.txt")
-
+        files = self.dependency_files(user_id)
+        os.makedirs(files["dir"], exist_ok=True)
+        generation = self._read_generation(files)
+        index_file = files["index"]
+        embeddings_file = files["embeddings"]
+        paths_file = files["paths"]
+        annotations_file = files["annotations"]
+
+        annotations = None
         if os.path.exists(annotations_file):
-            self.annotations[user_id] = self.load_annotations(annotations_file)
-        if self.annotations.get(user_id) is None:
-            self.annotations[user_id] = {}
-            if not os.path.exists(annotations_file):
-                with open(annotations_file, "w") as file:
-                    pass
+            annotations = self.load_annotations(annotations_file)
+        if annotations is None:
+            annotations = {}
+            with open(annotations_file, "w") as file:
+                pass
 
         # 加载 embeddings, image_paths 和 index（如果文件存在），否则从 image_dir 构建
         if os.path.exists(embeddings_file) and os.path.exists(paths_file) and os.path.exists(index_file):
             print("Loading saved index and embeddings...")
-            self.features[user_id] = np.load(embeddings_file)
+            features = np.load(embeddings_file)
 
             with open(paths_file, "r") as f:
-                self.image_paths[user_id] = [line.strip() for line in f.readlines()]
+                image_paths = [line.strip() for line in f.readlines()]
 
-            self.index[user_id] = faiss.read_index(index_file)
-        else:
-            self.features[user_id] = np.empty((0, 512), dtype=np.float32)
-            np.save(embeddings_file, self.features[user_id])
+            index = faiss.read_index(index_file)
+            deleted = np.load(files["tombstones"]).tolist() if os.path.exists(files["tombstones"]) else None
 
-            self.image_paths[user_id] = []
-            with open(paths_file, "w") as f:
-                for path in self.image_paths[user_id]:
-                    f.write(path + "\n")
-
-            self.index[user_id] = self.build_hnsw_index(self.features[user_id])
-            faiss.write_index(self.index[user_id], index_file)
+            if os.path.exists(files["ids"]):
+                ids = np.load(files["ids"]).astype(np.int64)
+            else:
+                # 旧数据没有照片ID：先用负数占位ID（-2, -3, ...），可用 migrations/backfill_vector_photo_ids.py 回填
+                ids = -np.arange(2, len(image_paths) + 2, dtype=np.int64)
+
+            metadata = VectorMetadata.load(files["metadata"], len(image_paths))
+            entry = UserIndexEntry(user_id, index, features, image_paths, annotations, ids, deleted=deleted,
+                                   metadata=metadata)
+            if not isinstance(index, faiss.IndexIDMap):
+                # 旧的按行号对齐的索引，一次性重建为以照片ID为键的索引
+                print("Rebuilding positional index as ID-mapped index...")
+                entry.features = l2_normalize(features)
+                entry.index = self._build_user_index(entry.features, ids)
+                self._save_dependencies(entry, files)
+            elif not self.index_policy.metric_matches(index):
+                # 旧的 L2 索引：向量归一化后重建为内积（余弦）索引，
+                # 也可以用 migrations/renormalize_vector_embeddings.py 离线批量处理
+                print("Re-normalizing embeddings and rebuilding inner-product index...")
+                entry.features = l2_normalize(features)
+                entry.index = self._build_user_index(entry.features, ids)
+                self._save_dependencies(entry, files)
+            elif self.index_policy.needs_migration(index, entry.live_count()):
+                # 之前按固定类型（或旧阈值）构建的索引，后台迁移到与图库大小相符的类型
+                self.compactor.schedule(user_id)
+        else:
+            features = np.empty((0, 512), dtype=np.float32)
+            ids = np.empty((0,), dtype=np.int64)
+            entry = UserIndexEntry(user_id, self._build_user_index(features, ids), features, [], annotations, ids)
+            self._save_dependencies(entry, files)
             '''
             features_list = []
             self.image_paths[user_id] = []
@@ -530,10 +1071,15 @@ class RetrievalModel:
             self.index[user_id] = self.build_hnsw_index(self.features[user_id])
             faiss.write_index(self.index[user_id], index_file)
             '''
-        print(f"annotations for {user_id}: ", len(self.annotations[user_id]))
-        print(f"index for {user_id}: ", self.index[user_id])
-        print(f"paths for {user_id}: ", len(self.image_paths[user_id]))
-        print(f"features for {user_id}: ", self.features[user_id])
+        if entry.generation is None:
+            # 加载期间没有写回文件，记录加载时磁盘上的版本标记
+            entry.generation = generation
+        print(f"annotations for {user_id}: ", len(entry.annotations))
+        print(f"index for {user_id}: ", entry.index)
+        print(f"paths for {user_id}: ", len(entry.image_paths))
+        print(f"tombstones for {user_id}: ", len(entry.deleted))
+        print(f"features for {user_id}: ", entry.features.shape)
+        return entry
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TextEncodeBatcher:
+    """
+    文本查询的跨请求动态批处理。
+    多个请求同时提交查询文本时，后台线程最多等待 max_wait_ms 毫秒或凑满 max_batch_size 条，
+    用一次前向传播批量编码，再把每条结果分发回各自的请求。
+    encode_fn(texts) 需要返回 (len(texts), dim) 的矩阵，失败时返回 None。
+    """
+
+    def __init__(self, encode_fn, max_batch_size=16, max_wait_ms=5):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self.batches = 0
+        self.items = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="text-encode-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """
+        提交一条查询文本，返回 Future，结果为该文本的一维 embedding（失败时为 None）
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text, timeout=None):
+        """
+        提交一条查询文本并等待结果
+        """
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        # 阻塞等待第一条，然后在 max_wait_ms 内尽量多收集
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                features = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for i, (_, future) in enumerate(batch):
+                future.set_result(None if features is None else features[i])
+
+    def stats(self):
+        """
+        返回批处理统计信息
+        """
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
@@ -0,0 +1,197 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+from retrieval_model.vector_metadata import VectorMetadata
+
+# 进程内所有条目共用的版本号计数器：条目被淘汰后重新加载也不会复用之前的版本号，
+# 以 (用户, 版本号) 为键的结果集缓存不会把旧的排名当成新条目的结果
+_versions = itertools.count(1)
+
+
+class UserIndexEntry:
+    """
+    单个用户常驻内存的检索依赖：faiss 索引、特征矩阵、图片路径、照片ID、注释和向量元数据。
+    features、image_paths、ids、metadata 按行一一对应，索引中的向量以照片ID（photos.id）为键；
+    被删除的行只记入 deleted（墓碑），在压缩（compaction）之前仍然占着原来的位置。
+    对条目的读写都应持有 self.lock，faiss 索引本身不是线程安全的。
+    generation 是加载或最后一次写回时磁盘上依赖文件的版本标记，与磁盘不一致说明文件被其他进程改过。
+    """
+
+    def __init__(self, user_id, index, features, image_paths, annotations, ids, deleted=None, metadata=None):
+        self.user_id = user_id
+        self.index = index
+        self.features = features
+        self.image_paths = image_paths
+        self.annotations = annotations
+        self.ids = ids
+        # 每行的照片状态、图集和上传时间，用于按视图筛选检索
+        self.metadata = metadata if metadata is not None else VectorMetadata.unknown(len(image_paths))
+        self.deleted = set(deleted) if deleted is not None else set()
+        # 图片路径 / 照片ID -> 行号，删除时 O(1) 定位；只包含未删除的行
+        self.path_to_row = {}
+        self.id_to_row = {}
+        self.rebuild_lookups()
+        # 每次修改都换一个新的版本号，后台压缩据此判断重建期间条目是否被改动过
+        self.version = next(_versions)
+        self.generation = None
+        self.lock = threading.RLock()
+
+    def bump_version(self):
+        """条目被修改后调用（调用方持有 self.lock）"""
+        self.version = next(_versions)
+
+    def rebuild_lookups(self):
+        """根据 image_paths、ids 和 deleted 重建路径/ID到行号的映射"""
+        self.path_to_row = {path: row for row, path in enumerate(self.image_paths) if row not in self.deleted}
+        self.id_to_row = {int(photo_id): row for row, photo_id in enumerate(self.ids) if row not in self.deleted}
+
+    def live_count(self):
+        """未被删除的向量数量"""
+        return len(self.image_paths) - len(self.deleted)
+
+    def tombstone_ratio(self):
+        """墓碑占索引总行数的比例"""
+        return len(self.deleted) / len(self.image_paths) if self.image_paths else 0.0
+
+    def nbytes(self):
+        """
+        估算该条目占用的内存（字节）
+        faiss 索引内部保存了一份向量副本，HNSW 还有邻接表，这里按向量大小的 2 倍粗略估计
+        """
+        size = self.features.nbytes + self.ids.nbytes + self.metadata.nbytes()
+        size += 2 * self.index.ntotal * self.index.d * 4
+        size += sum(len(path) for path in self.image_paths)
+        size += sum(len(path) + len(text) for path, text in self.annotations.items())
+        return size
+
+
+class UserIndexCache:
+    """
+    按用户缓存 UserIndexEntry 的 LRU 缓存。
+    条目只在第一次使用时从磁盘加载，之后的增删改直接作用在内存中的条目上；
+    其他进程修改了同一用户的文件时，由 RetrievalModel 调用 invalidate 丢弃过期的条目；
+    总内存超过 max_bytes 时按最近最少使用的顺序淘汰（磁盘文件在每次修改后都已写回，淘汰不会丢数据）。
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+        # 每个正在加载的用户一把锁：同一用户只加载一次，加载期间不阻塞其他用户（包括命中缓存的请求）
+        self._loading = {}
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user_id):
+        # 路由里 user_id 既有 int 也有 str（表单参数），统一成 str，避免同一用户缓存两份
+        return str(user_id)
+
+    def get(self, user_id, loader):
+        """
+        获取用户的缓存条目，未命中时调用 loader(user_id) 从磁盘加载
+        加载在全局锁之外进行（可能需要重建整个索引），只持有该用户的加载锁
+        """
+        key = self._key(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                # 等待期间其他线程可能已经加载完成
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+            try:
+                entry = loader(key)
+            except BaseException:
+                with self._lock:
+                    if self._loading.get(key) is loading:
+                        del self._loading[key]
+                raise
+            with self._lock:
+                # 放入缓存和释放加载锁在同一个临界区内，之后到达的请求一定能命中
+                if self._loading.get(key) is loading:
+                    del self._loading[key]
+                self.loads += 1
+                self._entries[key] = entry
+                self._sizes[key] = entry.nbytes()
+                self._evict_over_budget(keep=key)
+            return entry
+
+    def peek(self, user_id):
+        """返回缓存中的条目（不存在时返回 None），不加载、不计入命中次数"""
+        with self._lock:
+            return self._entries.get(self._key(user_id))
+
+    def invalidate(self, user_id, entry):
+        """
+        丢弃已经过期的条目（磁盘文件被其他进程修改过），只有缓存中仍是这个条目时才丢弃，
+        避免把其他线程刚重新加载的条目也丢掉
+        """
+        key = self._key(user_id)
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+                self._sizes.pop(key, None)
+                self.invalidations += 1
+
+    def update(self, user_id):
+        """
+        条目内容被修改后重新计算其内存占用，必要时淘汰其他用户的条目
+        """
+        key = self._key(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            self._sizes[key] = entry.nbytes()
+            self._evict_over_budget(keep=key)
+
+    def evict(self, user_id):
+        """
+        主动丢弃某个用户的缓存条目，下次使用时重新从磁盘加载
+        """
+        key = self._key(user_id)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._sizes.pop(key, None)
+                self.evictions += 1
+
+    def _evict_over_budget(self, keep=None):
+        while sum(self._sizes.values()) > self.max_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                # 只剩当前条目，即使超出预算也保留
+                break
+            del self._entries[victim]
+            del self._sizes[victim]
+            self.evictions += 1
+            print(f"index cache: evicted user {victim}")
+
+    def stats(self):
+        """
+        返回缓存的统计信息
+        """
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
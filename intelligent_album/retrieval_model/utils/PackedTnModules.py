@@ -0,0 +1,122 @@
+import torch
+import torch.nn as nn
+
+
+def Ternarize(W, group_size=-1):
+    """
+    按输入维度分组三值化：每组 group_size 列共享一个缩放系数 m（组内绝对值均值的 2 倍，与 TnModules.Ternarize 一致）
+    group_size=-1 表示整个矩阵一个缩放系数
+    返回 (三值矩阵 int8，取值 -1/0/1，形状同 W；每列的缩放系数，形状 (in_features,))
+    """
+    with torch.no_grad():
+        W = W.float()
+        in_features = W.shape[1]
+        if group_size <= 0 or group_size >= in_features:
+            m = (W.abs().mean() * 2).expand(in_features).clone()
+        else:
+            groups = (in_features + group_size - 1) // group_size
+            col_mean = W.abs().mean(dim=0)
+            padded = torch.zeros(groups * group_size, dtype=W.dtype, device=W.device)
+            padded[:in_features] = col_mean
+            counts = torch.full((groups,), group_size, dtype=W.dtype, device=W.device)
+            counts[-1] = in_features - (groups - 1) * group_size
+            group_mean = padded.view(groups, group_size).sum(dim=1) / counts
+            m = (group_mean * 2).repeat_interleave(group_size)[:in_features]
+        m = torch.clamp(m, min=1e-8)
+        T = torch.clamp(torch.round(W / m), min=-1, max=1).to(torch.int8)
+        return T, m
+
+
+def pack_ternary(T):
+    """
+    把 -1/0/1 的 int8 矩阵打包成每个值 2 bit：编码为 0/1/2（值 + 1），每个字节存 4 个值
+    返回 uint8 矩阵，形状 (out_features, ceil(in_features / 4))
+    """
+    out_features, in_features = T.shape
+    padded_in = (in_features + 3) // 4 * 4
+    codes = torch.ones((out_features, padded_in), dtype=torch.uint8, device=T.device)
+    codes[:, :in_features] = (T + 1).to(torch.uint8)
+    codes = codes.view(out_features, padded_in // 4, 4)
+    return codes[..., 0] | (codes[..., 1] << 2) | (codes[..., 2] << 4) | (codes[..., 3] << 6)
+
+
+def unpack_ternary(packed, in_features):
+    """pack_ternary 的逆操作，返回 -1/0/1 的 int8 矩阵"""
+    shifts = torch.tensor([0, 2, 4, 6], dtype=torch.uint8, device=packed.device)
+    codes = (packed.unsqueeze(-1) >> shifts) & 3
+    return codes.view(packed.shape[0], -1)[:, :in_features].to(torch.int8) - 1
+
+
+class PackedTnLinear(nn.Module):
+    """
+    CPU 上的 2 bit 三值线性层：权重以 2 bit/值打包存放，外加每组一个 float 缩放系数，
+    内存约为 fp32 权重的 1/16。
+    因为缩放系数只随输入列变化，y = (x * m) @ T^T，T 只有 -1/0/1，乘法退化为加减；
+    forward 按 chunk_rows 行分块解包成 -1/0/1 后交给 BLAS 做这部分加减累加，临时内存只有一个分块的大小。
+    """
+
+    def __init__(self, in_features, out_features, bias=True, group_size=-1, chunk_rows=256):
+        super(PackedTnLinear, self).__init__()
+        self.in_features = in_features
+        self.out_features = out_features
+        self.group_size = group_size
+        self.chunk_rows = chunk_rows
+        self.register_buffer("packed", torch.zeros((out_features, (in_features + 3) // 4), dtype=torch.uint8))
+        self.register_buffer("scale", torch.ones(in_features, dtype=torch.float32))
+        if bias:
+            self.bias = nn.Parameter(torch.zeros(out_features), requires_grad=False)
+        else:
+            self.register_parameter("bias", None)
+
+    @classmethod
+    def from_linear(cls, module, group_size=-1, chunk_rows=256):
+        """由 nn.Linear（或 TnLinear）的 fp32 权重构造打包层"""
+        layer = cls(module.in_features, module.out_features, bias=(module.bias is not None),
+                    group_size=group_size, chunk_rows=chunk_rows)
+        T, m = Ternarize(module.weight.data, group_size=group_size)
+        layer.packed = pack_ternary(T)
+        layer.scale = m.float()
+        if module.bias is not None:
+            layer.bias = nn.Parameter(module.bias.data.clone(), requires_grad=False)
+        return layer
+
+    def forward(self, x):
+        shape = x.shape
+        xs = x.reshape(-1, self.in_features) * self.scale.to(x.dtype)
+        output = torch.empty((xs.shape[0], self.out_features), dtype=x.dtype, device=x.device)
+        for start in range(0, self.out_features, self.chunk_rows):
+            end = min(start + self.chunk_rows, self.out_features)
+            T = unpack_ternary(self.packed[start:end], self.in_features).to(x.dtype)
+            output[:, start:end] = xs @ T.t()
+        if self.bias is not None:
+            output += self.bias.to(x.dtype)
+        return output.view(*shape[:-1], self.out_features)
+
+    def extra_repr(self):
+        return (f"in_features={self.in_features}, out_features={self.out_features}, "
+                f"bias={self.bias is not None}, group_size={self.group_size}")
+
+
+def replace_linear2packed(model, group_size=-1, chunk_rows=256, quantize=True):
+    """
+    把模型中的 nn.Linear 替换成 PackedTnLinear，用法与 TnModules.replace_linear 相同
+    默认 group_size=-1（整个矩阵一个缩放系数），与量化感知训练时 TnLinear 的三值化方式完全一致；
+    分组缩放误差更小，但与训练时的权重不同，需要重新评估检索效果
+    替换后原来的 fp32 权重不再被引用，可以被释放
+    quantize=False 时只替换结构、不读取原权重，用于随后加载已导出的打包权重
+    """
+    for name, module in model.named_children():
+        if isinstance(module, nn.Linear):
+            if quantize:
+                new_layer = PackedTnLinear.from_linear(module, group_size=group_size, chunk_rows=chunk_rows)
+            else:
+                new_layer = PackedTnLinear(module.in_features, module.out_features, bias=(module.bias is not None),
+                                           group_size=group_size, chunk_rows=chunk_rows)
+            setattr(model, name, new_layer)
+        elif len(list(module.children())) > 0:
+            replace_linear2packed(module, group_size=group_size, chunk_rows=chunk_rows, quantize=quantize)
+
+
+def model_nbytes(model):
+    """模型参数和 buffer 占用的字节数"""
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
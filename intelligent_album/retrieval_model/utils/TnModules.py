@@ -30,8 +30,24 @@ def harmonic_Ternarize(W):
 class TnLinear(nn.Linear):
     def __init__(self, *args, **kwargs):
         super(TnLinear, self).__init__(*args, **kwargs)
+        # 推理模式：权重已经三值化并保存在 self.weight 中，forward 直接做普通的 linear
+        self.frozen = False
+
+    def freeze(self):
+        """
+        推理模式：只三值化一次，把 W * m 写回权重，之后的 forward 不再重复三值化
+        Ternarize 不是幂等的，所以只能调用一次
+        """
+        if self.frozen:
+            return
+        with torch.no_grad():
+            self.weight = nn.Parameter(Ternarize(self.weight.data), requires_grad=False)
+        self.frozen = True
 
     def forward(self, x):
+        if self.frozen:
+            return nn.functional.linear(x, self.weight, self.bias)
+
         w = self.weight
         w_tn = w + (Ternarize(w.data)- w).detach()
 
@@ -39,7 +55,28 @@ class TnLinear(nn.Linear):
         return output
 
 
-def replace_linear(model):
+def freeze_tn_linear(model):
+    """把模型中所有 TnLinear 切换到推理模式，返回切换的层数"""
+    count = 0
+    for module in model.modules():
+        if isinstance(module, TnLinear) and not module.frozen:
+            module.freeze()
+            count += 1
+    return count
+
+
+def replace_linear(model, inference=False):
+    """
+    把模型中的 nn.Linear 替换成 TnLinear
+    inference=True 时在替换后立即三值化权重（只做一次），适合只做推理的检索服务；
+    训练（量化感知训练）时保持默认的 False，每次 forward 重新三值化以便梯度直通
+    """
+    _replace_linear(model)
+    if inference:
+        freeze_tn_linear(model)
+
+
+def _replace_linear(model):
     for name, module in model.named_children():
         if isinstance(module, nn.Linear):
             # print(f"Replacing {name} with TnLinear")
@@ -55,4 +92,4 @@ def replace_linear(model):
             #new_layers = new_linear
             setattr(model, name, new_linear)
         elif len(list(module.children())) > 0:
-            replace_linear(module)
\ No newline at end of file
+            _replace_linear(module)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import time
+
+import numpy as np
+
+# 字段未知（旧数据还没有同步元数据）时的取值，筛选时未知字段视为满足条件，由数据库复核
+UNKNOWN_STATUS = -1
+UNKNOWN_ALBUM = -2
+NO_ALBUM = -1
+UNKNOWN_TIME = -1
+# 已经同步过、但数据库中上传时间为 NULL 的照片：不再视为未知，也不满足"最近"视图（与数据库中 time >= ... 的结果一致）
+NO_TIME = -2
+
+RECENT_SECONDS = 7 * 24 * 3600
+
+
+def view_selector(view):
+    """
+    把照片视图转换成向量元数据的筛选条件，与 models/photo.py 中的 _view_condition 保持一致
+    view: "all"（正常照片）、"trash"（回收站）、"recent"（最近一周的正常照片）
+    """
+    if view == 'trash':
+        return {"status": 1}
+    if view == 'recent':
+        return {"status": 0, "since": int(time.time()) - RECENT_SECONDS}
+    return {"status": 0}
+
+
+class VectorMetadata:
+    """
+    与特征矩阵按行对齐的紧凑元数据：照片状态、所属图集和上传时间（秒级时间戳）。
+    保存在每个用户依赖目录下的 vector_metadata.npz 中，检索时据此在索引内按视图筛选，
+    不再先取 top-k 再到数据库里过滤。
+    """
+
+    def __init__(self, status, album_id, time_):
+        self.status = status
+        self.album_id = album_id
+        self.time = time_
+
+    @classmethod
+    def unknown(cls, n):
+        """n 行全部未知的元数据"""
+        return cls(np.full(n, UNKNOWN_STATUS, dtype=np.int8),
+                   np.full(n, UNKNOWN_ALBUM, dtype=np.int64),
+                   np.full(n, UNKNOWN_TIME, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path, n):
+        """从 npz 文件加载；文件不存在或行数与特征矩阵不一致时返回全部未知的元数据"""
+        if os.path.exists(path):
+            data = np.load(path)
+            if data["status"].shape[0] == n:
+                return cls(data["status"], data["album_id"], data["time"])
+            print(f"vector metadata {path} has {data['status'].shape[0]} rows, expected {n}; ignored")
+        return cls.unknown(n)
+
+    def save(self, path):
+        # np.savez 会自动补上 .npz 后缀，直接写文件对象以保持文件名不变
+        with open(path, "wb") as f:
+            np.savez(f, status=self.status, album_id=self.album_id, time=self.time)
+
+    def __len__(self):
+        return self.status.shape[0]
+
+    def nbytes(self):
+        return self.status.nbytes + self.album_id.nbytes + self.time.nbytes
+
+    def append(self, records):
+        """追加若干行，records 中每个元素是 set_row 可以识别的字典（或 None 表示未知）"""
+        extra = VectorMetadata.unknown(len(records))
+        for row, record in enumerate(records):
+            extra.set_row(row, record or {})
+        self.status = np.concatenate([self.status, extra.status])
+        self.album_id = np.concatenate([self.album_id, extra.album_id])
+        self.time = np.concatenate([self.time, extra.time])
+
+    def take(self, rows):
+        """按行号选取（压缩时使用）"""
+        return VectorMetadata(self.status[rows], self.album_id[rows], self.time[rows])
+
+    def set_row(self, row, record):
+        """
+        更新一行，record 中只包含需要修改的字段：
+          status: 照片状态；album_id: 图集ID（None 表示不属于任何图集）；
+          time: datetime 或时间戳（None 表示数据库中没有上传时间）
+        """
+        if "status" in record and record["status"] is not None:
+            self.status[row] = int(record["status"])
+        if "album_id" in record:
+            self.album_id[row] = NO_ALBUM if record["album_id"] is None else int(record["album_id"])
+        if "time" in record:
+            value = record["time"]
+            if value is None:
+                self.time[row] = NO_TIME
+            else:
+                self.time[row] = int(value.timestamp()) if hasattr(value, "timestamp") else int(value)
+
+    def mask(self, selector):
+        """
+        返回满足筛选条件的行（布尔数组）
+        selector: {"status": int, "album_id": int, "since": 时间戳}，各字段可省略；未知字段视为满足
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if selector.get("status") is not None:
+            mask &= (self.status == selector["status"]) | (self.status == UNKNOWN_STATUS)
+        if selector.get("album_id") is not None:
+            mask &= (self.album_id == selector["album_id"]) | (self.album_id == UNKNOWN_ALBUM)
+        if selector.get("since") is not None:
+            mask &= (self.time >= selector["since"]) | (self.time == UNKNOWN_TIME)
+        return mask
+
+    def unknown_rows(self):
+        """任一字段未知的行号"""
+        return np.nonzero((self.status == UNKNOWN_STATUS) | (self.album_id == UNKNOWN_ALBUM)
+                          | (self.time == UNKNOWN_TIME))[0]
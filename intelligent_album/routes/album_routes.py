@@ -74,12 +74,15 @@ def get_user_albums(user_id):
     ---
     路径参数:
       - user_id: 用户ID
+    查询参数:
+      - limit: 限制返回数量（可选）
+      - offset: 偏移量（分页，可选）
     """
-    albums = Album.find_by_user(user_id)
-    
-    # 获取每个图集的照片数量
-    for album in albums:
-        album['photo_count'] = Album.get_photo_count(album['id'])
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', type=int)
+
+    # 图集和每个图集的照片数量在一条查询中取回
+    albums = Album.find_by_user_with_counts(user_id, limit, offset) or []
     
     return jsonify({
         'success': True,
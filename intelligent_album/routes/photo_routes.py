@@ -1,15 +1,16 @@
 from flask import Blueprint, request, jsonify
 from models.photo import Photo
 from models.album import Album
+from models.index_job import IndexJob
+from services.retrieval_provider import get_retrieval_model, get_indexing_queue, is_retrieval_model_loaded, \
+    provider_stats, warm_up
+from services.translator import BaiduTranslator, CachedTranslator
+from retrieval_model.vector_metadata import view_selector
 import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from retrieval_model.retrieval import RetrievalModel
 from config.database import execute_query
-import requests
-import random
 import json
-from hashlib import md5
 
 appid = '20250419002337307'
 appkey = 'w1cCl8NKAPl9JWsLgWIP'
@@ -20,20 +21,21 @@ photo_bp = Blueprint('photo', __name__)
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                              'uploads')  # 此处生成的路径为/intelligent_album/uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# 游标分页时默认的每页数量
+DEFAULT_PAGE_SIZE = 50
+# 语义检索每页最多返回的结果数量
+MAX_SEARCH_TOP_K = 100
 
 # 确保上传目录存在
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# 定义检索模型！！
-# todo:希望这是一个全局变量，在每个用户登录时初始化
-# 测试能不能正常使用。模型加载路径在audoDL服务器上
-# retrieval_model = RetrievalModel(
-#     quantized=True,
-#     use_bitblas=False
-# )
-retrieval_model = RetrievalModel(
-    quantized=False,
-    use_bitblas=False
+# 检索模型和后台建索引队列都是进程级单例（services/retrieval_provider.py），第一次使用时才加载，
+# 导入本模块不会加载模型；需要提前加载时调用 retrieval_provider.warm_up()
+
+# 查询翻译：百度翻译 + 内存/磁盘缓存。离线环境或测试中可以换成 services.translator.LocalTranslator
+translator = CachedTranslator(
+    BaiduTranslator(appid, appkey),
+    cache_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'retrieval_model', 'utils', 'translations.sqlite')
 )
 
 
@@ -44,37 +46,101 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def chinese_to_english(text):
-    from_lang = 'zh'
-    to_lang = 'en'
-    endpoint = 'http://api.fanyi.baidu.com'
-    path = '/api/trans/vip/translate'
-    url = endpoint + path
-
-    def make_md5(s, encoding='utf-8'):
-        return md5(s.encode(encoding)).hexdigest()
-
-    salt = random.randint(32768, 65536)
-    sign = make_md5(appid + text + str(salt) + appkey)
-
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    payload = {
-        'appid': appid,
-        'q': text,
-        'from': from_lang,
-        'to': to_lang,
-        'salt': salt,
-        'sign': sign
-    }
-
+def enqueue_index_jobs(user_id, photo_ids, file_paths):
+    """
+    为新上传的照片创建后台建索引任务，返回任务ID列表（创建失败的为 None）
+    任务创建失败（例如 index_jobs 表还没有迁移）时退回到同步加入索引，保证照片仍能被检索到
+    """
+    job_ids = []
+    fallback_ids, fallback_paths = [], []
+    for photo_id, file_path in zip(photo_ids, file_paths):
+        result = IndexJob.create(photo_id, user_id, file_path)
+        if result['success']:
+            job_ids.append(result['job_id'])
+        else:
+            job_ids.append(None)
+            fallback_ids.append(photo_id)
+            fallback_paths.append(file_path)
+
+    if fallback_paths:
+        print(f"警告: 创建索引任务失败，同步建立 {len(fallback_paths)} 张照片的索引")
+        get_retrieval_model().add_images(user_id=user_id, new_image_paths=fallback_paths, photo_ids=fallback_ids)
+    if len(fallback_paths) < len(file_paths):
+        get_indexing_queue().notify()
+    return job_ids
+
+
+def update_vector_metadata(user_id, photo_id, **fields):
+    """
+    照片状态或图集变化后同步检索模型中的向量元数据，失败时只打印日志（检索结果仍会经过数据库复核）
+    """
     try:
-        r = requests.post(url, params=payload, headers=headers)
-        result = r.json()
-        if 'trans_result' in result:
-            return '\n'.join([item['dst'] for item in result['trans_result']])
-        return f"Error: {result.get('error_msg', 'Unknown error')}"
+        get_retrieval_model().set_metadata(user_id, [dict(fields, photo_id=photo_id)])
     except Exception as e:
-        return f"Request failed: {str(e)}"
+        print(f"同步向量元数据失败: {e}")
+
+
+def merge_model_results(user_id, model_results, view, album_id=None):
+    """
+    把检索模型的结果 (图片绝对路径, 注释, 分数, 照片ID) 按排名转换成数据库中的照片记录
+    一次批量查询取回所有命中的照片，而不是每个命中一次查询；不满足视图/图集条件的照片会被过滤掉
+    """
+    base_path = os.path.dirname(os.path.dirname(__file__))
+    photo_ids = [item[3] for item in model_results if item[3] is not None]
+    # 没有照片ID的旧索引数据，通过图片相对路径查找
+    legacy_paths = [os.path.relpath(item[0], base_path) for item in model_results if item[3] is None]
+
+    by_id = {record['id']: record for record in Photo.find_by_ids(user_id, photo_ids, view)}
+    by_address = {}
+    for record in Photo.find_by_addresses(user_id, legacy_paths, view):
+        by_address.setdefault(record['address'], record)
+
+    # 按检索排名合并结果
+    photos = []  # 最终检索结果。是一个列表，列表中每个元素是一个字典，也就是数据库的一条记录
+    bucket = {}
+    for item in model_results:
+        if item[3] is not None:
+            record = by_id.get(item[3])
+        else:
+            record = by_address.get(os.path.relpath(item[0], base_path))
+        if album_id is not None and record is not None and record['album_id'] != album_id:
+            continue
+        if record is not None and bucket.get(record['id']) is None:
+            # 附上检索分数（余弦相似度，越大越相似）
+            record = dict(record, score=round(float(item[2]), 4))
+            bucket[record['id']] = record
+            photos.append(record)
+    return photos
+
+
+def list_photos_page(find_fn, user_id):
+    """
+    按请求参数分页查询照片，返回 (photos, next_cursor)
+    请求中带 cursor 参数（第一页传空字符串）时使用游标分页：多取一条判断是否还有下一页，
+    有则返回下一页的 next_cursor，否则 next_cursor 为 None；
+    不带 cursor 参数时保持原来的 limit/offset 行为。
+    游标无效时抛出 ValueError
+    """
+    limit = request.args.get('limit', type=int)
+    if 'cursor' not in request.args:
+        offset = request.args.get('offset', type=int)
+        return find_fn(user_id, limit, offset) or [], None
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    photos = find_fn(user_id, limit + 1, cursor=request.args.get('cursor')) or []
+    next_cursor = None
+    if len(photos) > limit:
+        photos = photos[:limit]
+        next_cursor = Photo.encode_cursor(photos[-1])
+    return photos, next_cursor
+
+
+def chinese_to_english(text):
+    """
+    把中文查询翻译成英文（检索模型只理解英文）
+    英文查询不做翻译；翻译结果按原文缓存在内存和磁盘中；翻译失败时返回原文
+    """
+    return translator.translate(text)
 
 
 @photo_bp.route('/upload', methods=['POST'])
@@ -139,12 +205,9 @@ def upload_photo():
     file.save(file_path)
     print(f"文件保存到: {file_path}")
 
-    # 检索模型添加索引
     # text = request.form.get('text', '')
     # print(text)
     text = ''
-    retrieval_model.add_image(user_id=user_id, new_image_path=file_path)
-    print(retrieval_model.get_all_image_annotation_pairs(user_id=user_id))
     # 相对路径，用于存储在数据库中
     relative_path = f"uploads/{user_id}/{new_filename}"  # 数据库中的路径格式是：uploads/user_id/filename
 
@@ -175,6 +238,9 @@ def upload_photo():
     )
 
     if result['success']:
+        # 创建后台建索引任务，照片在任务完成后即可被检索到，上传请求不等待模型
+        job_id = enqueue_index_jobs(user_id, [result['photo_id']], [file_path])[0]
+
         # 如果是第一张照片，并且有图集ID，则设置为图集封面
         if album_id:
             album = Album.find_by_id(album_id)
@@ -186,7 +252,8 @@ def upload_photo():
             'success': True,
             'message': '照片上传成功',
             'photo_id': result['photo_id'],
-            'photo_url': relative_path
+            'photo_url': relative_path,
+            'index_job_id': job_id
         }
         print(f"返回响应: {response}")
         return jsonify(response), 201
@@ -198,6 +265,100 @@ def upload_photo():
         }), 400
 
 
+@photo_bp.route('/upload_batch', methods=['POST'])
+def upload_photos_batch():
+    """
+    批量上传照片 -- 模型版
+    照片由后台建索引队列按 batch 送入检索模型提取特征，每个 batch 只写一次索引文件
+    ---
+    表单参数:
+      - photos: 照片文件（可以有多个）
+      - user_id: 用户ID
+      - album_id: 图集ID（可选）
+      - status: 照片状态（可选，默认0）
+    """
+    files = request.files.getlist('photos')
+    if not files:
+        return jsonify({
+            'success': False,
+            'message': '没有提供照片文件'
+        }), 400
+
+    user_id = request.form.get('user_id')
+    if not user_id:
+        return jsonify({
+            'success': False,
+            'message': '请提供用户ID'
+        }), 400
+
+    album_id = request.form.get('album_id')
+    try:
+        status = int(request.form.get('status', 0))
+        if status not in [0, 1, 2]:
+            status = 0
+    except ValueError:
+        status = 0
+
+    user_folder = os.path.join(UPLOAD_FOLDER, str(user_id))
+    os.makedirs(user_folder, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    # 第一步：保存所有文件
+    saved = []  # (file_path, relative_path)
+    failed = []
+    for file in files:
+        if file.filename == '' or not allowed_file(file.filename):
+            failed.append({'filename': file.filename, 'message': '不支持的文件类型'})
+            continue
+        filename = secure_filename(file.filename)
+        new_filename = f"{timestamp}_{filename}"
+        # 同一批次中可能有同名文件
+        suffix = 1
+        while os.path.exists(os.path.join(user_folder, new_filename)):
+            new_filename = f"{timestamp}_{suffix}_{filename}"
+            suffix += 1
+        file_path = os.path.join(user_folder, new_filename)
+        file.save(file_path)
+        saved.append((file_path, f"uploads/{user_id}/{new_filename}"))
+
+    # 第二步：保存到数据库
+    photos = []
+    indexed_paths = []  # 写入数据库成功、需要建立索引的文件
+    for file_path, relative_path in saved:
+        result = Photo.create(
+            address=relative_path,
+            user_id=user_id,
+            text='',
+            album_id=album_id,
+            status=status
+        )
+        if result['success']:
+            photos.append({'photo_id': result['photo_id'], 'photo_url': relative_path})
+            indexed_paths.append(file_path)
+        else:
+            os.remove(file_path)
+            failed.append({'filename': os.path.basename(file_path), 'message': result['message']})
+
+    # 第三步：创建后台建索引任务，由工作线程按 batch 提取特征并加入索引
+    job_ids = enqueue_index_jobs(user_id, [photo['photo_id'] for photo in photos], indexed_paths)
+    for photo, job_id in zip(photos, job_ids):
+        photo['index_job_id'] = job_id
+
+    # 如果图集还没有封面，则把第一张照片设置为封面
+    if album_id and photos:
+        album = Album.find_by_id(album_id)
+        if album and not album['cover_url']:
+            Album.update_cover(album_id, photos[0]['photo_url'])
+
+    print(f"批量上传完成: 成功 {len(photos)} 张, 失败 {len(failed)} 张")
+    return jsonify({
+        'success': len(photos) > 0,
+        'message': f'成功上传 {len(photos)} 张照片',
+        'photos': photos,
+        'failed': failed
+    }), 201 if photos else 400
+
+
 @photo_bp.route('/<int:photo_id>', methods=['GET'])
 def get_photo(photo_id):
     """
@@ -230,15 +391,20 @@ def get_user_photos(user_id):
     查询参数:
       - limit: 限制返回数量
       - offset: 偏移量（分页）
+      - cursor: 游标分页，第一页传空字符串，之后传上一页返回的 next_cursor（提供时忽略 offset）
     """
-    limit = request.args.get('limit', type=int)
-    offset = request.args.get('offset', type=int)
-
-    photos = Photo.find_by_user(user_id, limit, offset)
+    try:
+        photos, next_cursor = list_photos_page(Photo.find_by_user, user_id)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
 
     return jsonify({
         'success': True,
-        'photos': photos
+        'photos': photos,
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -272,13 +438,18 @@ def get_trash_photos(user_id):
     查询参数:
       - limit: 限制返回数量
       - offset: 偏移量（分页）
+      - cursor: 游标分页，第一页传空字符串，之后传上一页返回的 next_cursor（提供时忽略 offset）
     """
     print(f"获取用户 {user_id} 的回收站照片")
-    limit = request.args.get('limit', type=int)
-    offset = request.args.get('offset', type=int)
 
     # 调用模型方法获取回收站照片
-    photos = Photo.find_in_trash(user_id, limit, offset)
+    try:
+        photos, next_cursor = list_photos_page(Photo.find_in_trash, user_id)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
 
     # 添加调试信息
     print(f"查询到 {len(photos)} 张回收站照片")
@@ -296,7 +467,8 @@ def get_trash_photos(user_id):
 
     return jsonify({
         'success': True,
-        'photos': photos
+        'photos': photos,
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -333,6 +505,8 @@ def update_photo(photo_id):
     result = Photo.update(photo_id, text, album_id)
 
     if result['success']:
+        if album_id is not None:
+            update_vector_metadata(photo['user_id'], photo_id, album_id=album_id)
         return jsonify({
             'success': True,
             'message': '照片信息更新成功'
@@ -381,6 +555,7 @@ def update_photo_status(photo_id):
     result = Photo.update_status(photo_id, status)
 
     if result['success']:
+        update_vector_metadata(photo['user_id'], photo_id, status=status)
         return jsonify({
             'success': True,
             'message': '照片状态更新成功'
@@ -416,8 +591,7 @@ def delete_photo(photo_id):
             os.remove(file_path)
 
         # 模型索引文件删除该图片
-        retrieval_model.delete_image(user_id=photo['user_id'], image_path=file_path)
-        print(retrieval_model.get_all_image_annotation_pairs(photo['user_id']))
+        get_retrieval_model().delete_image(user_id=photo['user_id'], image_path=file_path, photo_id=photo_id)
     except Exception as e:
         print(f"删除文件错误: {e}")
 
@@ -446,12 +620,19 @@ def search_photos(user_id):
     查询参数:
       - keyword: 搜索查询语句
       - view: 当前视图（"all", "trash", "recent"）
+      - top_k: 本页的检索结果数量（默认 5，最多 MAX_SEARCH_TOP_K）
+      - min_score: 余弦相似度阈值，低于阈值的结果不返回
+      - offset: 从检索排名的第几个结果开始（翻页时传上一页响应中的 next_offset）
+      - album_id: 只在指定图集中检索（可选）
 
     修改此函数为检索模型版本
     """
-    query = request.args.get('keyword', '')
-    en_query = chinese_to_english(query)
+    query = request.args.get('keyword', '').strip()
     view = request.args.get('view', 'all')  # 默认为"all"视图
+    top_k = request.args.get('top_k', 5, type=int)
+    min_score = request.args.get('min_score', None, type=float)
+    offset = request.args.get('offset', 0, type=int)
+    album_id = request.args.get('album_id', None, type=int)
 
     if not query:
         return jsonify({
@@ -459,42 +640,42 @@ def search_photos(user_id):
             'message': '请提供查询语句'
         }), 400
 
+    if top_k <= 0 or top_k > MAX_SEARCH_TOP_K or offset < 0:
+        return jsonify({
+            'success': False,
+            'message': f'top_k 必须在 1 到 {MAX_SEARCH_TOP_K} 之间，offset 不能为负数'
+        }), 400
+
+    # 启用多语言编码器时直接用原文检索，否则先翻译成英文
+    retrieval_model = get_retrieval_model()
+    en_query = query if retrieval_model.multilingual else chinese_to_english(query)
+
     # 第一步：模型检索，返回检索结果列表
+    # 视图（以及图集）条件直接在检索层按向量元数据筛选，返回的是该视图内的 top-k；
+    # 元数据未知的旧向量视为满足条件，由下面的数据库查询复核（元数据由建索引队列和迁移脚本补齐）
+    selector = view_selector(view)
+    if album_id is not None:
+        selector['album_id'] = album_id
+    # 多取一个结果判断是否还有下一页；同一查询的翻页命中结果集缓存，不会重新检索
     model_results = retrieval_model.query(user_id=user_id,
-                                          text_input=en_query)  # model_results是一个列表，列表中每个元素是一个元组，元组第一个元素是图片绝对路径
+                                          text_input=en_query,
+                                          top_k=top_k + 1,
+                                          min_score=min_score,
+                                          offset=offset,
+                                          selector=selector)  # model_results是一个列表，列表中每个元素是一个元组 (图片绝对路径, 注释, 分数, 照片ID)
     # print(model_results)
     if type(model_results) is list:
-        # 第二步：mysql筛选，从检索结果列表中筛选mysql中符合条件的记录
-        base_path = os.path.dirname(os.path.dirname(__file__))
-        photos = []  # 最终检索结果。是一个列表，列表中每个元素是一个字典，也就是数据库的一条记录
-        bucket = {}
-        for item in model_results:
-            file_path = item[0]  # 获取元组的第一个元素
-            # 获取相对路径
-            rel_path = os.path.relpath(file_path, base_path)
-            print("rel_path:", rel_path)
-            # 根据视图类型搜索不同状态的照片
-            if view == 'trash':
-                # 在回收站中搜索（status=1）
-                db_results = Photo.search_in_trash(user_id, rel_path)
-            elif view == 'recent':
-                # 搜索最近的照片（status=0，一周内）
-                db_results = Photo.search_recent(user_id, rel_path)
-            else:
-                # 默认搜索正常照片（status=0）
-                db_results = Photo.search(user_id, rel_path)
-
-            # print(db_results)
-            # 将记录加入最终检索结果
-            for record in db_results:
-                if bucket.get(record['id']) is None:
-                    bucket[record['id']] = record
-                    photos.append(record)
+        next_offset = offset + top_k if len(model_results) > top_k else None
+        model_results = model_results[:top_k]
+        # 第二步：mysql复核，元数据未同步的旧向量也在这里按视图过滤
+        photos = merge_model_results(user_id, model_results, view, album_id)
 
         return jsonify({
             'success': True,
             'photos': photos,
-            'count': len(photos)
+            'count': len(photos),
+            'offset': offset,
+            'next_offset': next_offset
         }), 200
     else:
         return jsonify({
@@ -504,6 +685,151 @@ def search_photos(user_id):
         }), 200
 
 
+@photo_bp.route('/<int:photo_id>/similar', methods=['GET'])
+def find_similar_photos(photo_id):
+    """
+    以图搜图：查找与指定照片相似的照片
+    直接使用索引中已保存的该照片的向量检索，不经过模型推理
+    ---
+    路径参数:
+      - photo_id: 照片ID
+    查询参数:
+      - top_k: 返回的结果数量（默认 5，最多 MAX_SEARCH_TOP_K）
+      - view: 在哪个视图中查找（"all", "trash", "recent"），默认 "all"
+      - min_score: 余弦相似度阈值，低于阈值的结果不返回（可选）
+    """
+    photo = Photo.find_by_id(photo_id)
+
+    if not photo:
+        return jsonify({
+            'success': False,
+            'message': '照片不存在'
+        }), 404
+
+    top_k = request.args.get('top_k', 5, type=int)
+    view = request.args.get('view', 'all')
+    min_score = request.args.get('min_score', None, type=float)
+
+    if top_k <= 0 or top_k > MAX_SEARCH_TOP_K:
+        return jsonify({
+            'success': False,
+            'message': f'top_k 必须在 1 到 {MAX_SEARCH_TOP_K} 之间'
+        }), 400
+
+    user_id = photo['user_id']
+    retrieval_model = get_retrieval_model()
+    file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), photo['address'])
+    model_results = retrieval_model.find_similar(user_id, photo_id=photo_id, image_path=file_path,
+                                                 top_k=top_k, min_score=min_score, selector=view_selector(view))
+
+    if model_results is None:
+        # 照片还在后台建索引队列中，或者索引失败
+        return jsonify({
+            'success': False,
+            'message': '照片尚未加入检索索引，请稍后再试'
+        }), 409
+
+    photos = merge_model_results(user_id, model_results, view)
+    return jsonify({
+        'success': True,
+        'photos': photos,
+        'count': len(photos)
+    }), 200
+
+
+@photo_bp.route('/index_jobs/<int:job_id>', methods=['GET'])
+def get_index_job(job_id):
+    """
+    获取照片建索引任务的状态
+    ---
+    路径参数:
+      - job_id: 任务ID（上传接口返回的 index_job_id）
+    """
+    job = IndexJob.find_by_id(job_id)
+
+    if job:
+        return jsonify({
+            'success': True,
+            'job': job
+        }), 200
+    else:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+
+
+@photo_bp.route('/index_progress/<int:user_id>', methods=['GET'])
+def get_index_progress(user_id):
+    """
+    获取用户照片建索引的整体进度（各状态的任务数量）
+    ---
+    路径参数:
+      - user_id: 用户ID
+    """
+    counts = IndexJob.count_by_status(user_id)
+    total = sum(counts.values())
+
+    return jsonify({
+        'success': True,
+        'counts': counts,
+        'total': total,
+        'finished': total == counts[IndexJob.DONE] + counts[IndexJob.FAILED]
+    }), 200
+
+
+@photo_bp.route('/warm_up', methods=['POST'])
+def warm_up_retrieval():
+    """
+    预热检索模型：加载模型、启动后台建索引队列并编码一条查询
+    部署后调用一次，避免第一次检索请求承担模型加载时间
+    """
+    try:
+        warm_up()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'检索模型加载失败: {str(e)}'
+        }), 500
+    return jsonify({
+        'success': True,
+        'stats': provider_stats()
+    }), 200
+
+
+@photo_bp.route('/index_stats', methods=['GET'])
+def get_index_stats():
+    """
+    获取检索模型用户索引缓存的统计信息（常驻用户数、内存占用、加载/命中/淘汰次数）
+    模型还没有加载时只返回加载状态，不会因为查询统计而触发加载
+    """
+    stats = provider_stats()
+    if is_retrieval_model_loaded():
+        stats.update(get_retrieval_model().get_cache_stats())
+    return jsonify({
+        'success': True,
+        'stats': stats
+    }), 200
+
+
+@photo_bp.route('/index_info/<int:user_id>', methods=['GET'])
+def get_index_info(user_id):
+    """
+    获取用户检索索引的类型（flat / hnsw / ivfpq）、向量数量以及按当前图库大小推荐的类型
+    """
+    try:
+        info = get_retrieval_model().get_index_info(user_id)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取索引信息失败: {str(e)}'
+        }), 500
+    return jsonify({
+        'success': True,
+        'index': info
+    }), 200
+
+
 @photo_bp.route('/move/<int:photo_id>', methods=['PUT'])
 def move_to_album(photo_id):
     """
@@ -542,6 +868,7 @@ def move_to_album(photo_id):
     result = Photo.move_to_album(photo_id, album_id)
 
     if result['success']:
+        update_vector_metadata(photo['user_id'], photo_id, album_id=album_id)
         # 如果图集没有封面，则设置此照片为封面
         if album_id:
             album = Album.find_by_id(album_id)
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import defaultdict
+
+from models.index_job import IndexJob
+from models.photo import Photo
+
+
+def sync_vector_metadata(retrieval_model, user_id, chunk_size=1000):
+    """
+    从数据库补齐检索模型中元数据不完整的向量（元数据功能上线前建立的索引，或建索引时查询元数据失败的向量）
+    数据库查询成功、且确认已经不存在的照片，其向量才从索引中删除；
+    查询失败（例如连接池等待超时）时本次不做任何修改，返回 False，留到下一次再补齐
+    数据库中没有上传时间的照片同步后记为 NO_TIME，不会每次都被重新查询
+    """
+    missing = retrieval_model.missing_metadata(user_id)
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start:start + chunk_size]
+        records = Photo.find_metadata(user_id, chunk)
+        if records is None:
+            print(f"查询照片元数据失败，跳过用户 {user_id} 的向量元数据同步")
+            return False
+        retrieval_model.set_metadata(user_id, records)
+        found = {record['photo_id'] for record in records}
+        for photo_id in chunk:
+            if photo_id not in found:
+                retrieval_model.delete_image(user_id=user_id, photo_id=photo_id)
+    return True
+
+
+class IndexingQueue:
+    """
+    后台建索引队列
+    上传接口只负责保存文件、写入 photos 表并创建 index_jobs 记录；
+    工作线程从 index_jobs 表中批量领取任务，按用户分组调用 retrieval_model.add_images，
+    照片在任务完成后即可被检索到。任务记录在数据库中，进程重启后未完成的任务会被重新处理：
+    处理中的任务由心跳线程每 heartbeat_interval 秒刷新一次心跳，工作线程每 sweep_interval 秒
+    把心跳超过 stale_seconds 秒没有刷新的 running 任务（处理它的进程已经退出）放回等待队列。
+    """
+
+    def __init__(self, model_provider, num_workers=1, batch_size=32, poll_interval=2.0, max_attempts=3,
+                 heartbeat_interval=30.0, stale_seconds=90, sweep_interval=60.0):
+        # 返回 RetrievalModel 的无参函数；模型在第一次处理任务时才加载
+        self.model_provider = model_provider
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.sweep_interval = sweep_interval
+
+        self._wakeup = threading.Event()
+        self._threads = []
+        # 本进程正在处理的任务ID，由心跳线程定期刷新
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def start(self):
+        """
+        启动工作线程和心跳线程；已经退出的进程遗留的 running 任务由工作线程定期放回队列
+        """
+        if self._threads:
+            return
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"indexing-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="indexing-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def notify(self):
+        """
+        有新任务时唤醒工作线程（不调用也会在 poll_interval 内被处理）
+        """
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._sweep_stale()
+            try:
+                jobs = IndexJob.claim_pending(self.batch_size)
+            except Exception as e:
+                print(f"领取索引任务出错: {e}")
+                jobs = []
+
+            if not jobs:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_ids = [job['id'] for job in jobs]
+            with self._running_lock:
+                self._running.update(job_ids)
+            try:
+                self.process(jobs)
+            finally:
+                with self._running_lock:
+                    self._running.difference_update(job_ids)
+
+    def _sweep_stale(self):
+        """
+        每 sweep_interval 秒把心跳超时的 running 任务放回等待队列（多个工作线程只需要一个执行）
+        """
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            IndexJob.requeue_stale(self.stale_seconds, self.max_attempts)
+        except Exception as e:
+            print(f"回收超时的索引任务出错: {e}")
+        finally:
+            self._sweep_lock.release()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._running_lock:
+                job_ids = list(self._running)
+            try:
+                IndexJob.heartbeat(job_ids)
+            except Exception as e:
+                print(f"刷新索引任务心跳出错: {e}")
+
+    def process(self, jobs):
+        """
+        处理一批任务：按用户分组，每个用户一次 add_images
+        同一批任务由 claim_pending 一次领取，claimed_by 相同
+        """
+        by_user = defaultdict(list)
+        for job in jobs:
+            by_user[job['user_id']].append(job)
+
+        for user_id, user_jobs in by_user.items():
+            start = time.time()
+            token = user_jobs[0]['claimed_by']
+            try:
+                # 照片的状态、图集和上传时间随向量一起写入，检索时可以直接按视图筛选；
+                # 查询失败时元数据留空，之后由 sync_vector_metadata 补齐
+                records = Photo.find_metadata(user_id, [job['photo_id'] for job in user_jobs]) or []
+                by_photo = {record['photo_id']: record for record in records}
+                added, failed = self.model_provider().add_images(
+                    user_id=user_id,
+                    new_image_paths=[job['file_path'] for job in user_jobs],
+                    photo_ids=[job['photo_id'] for job in user_jobs],
+                    batch_size=self.batch_size,
+                    metadata=[by_photo.get(job['photo_id']) for job in user_jobs]
+                )
+            except Exception as e:
+                print(f"用户 {user_id} 的索引任务出错: {e}")
+                IndexJob.mark_failed([job['id'] for job in user_jobs], token, str(e), self.max_attempts)
+                continue
+
+            failed = set(failed)
+            IndexJob.mark_done([job['id'] for job in user_jobs if job['file_path'] not in failed], token)
+            IndexJob.mark_failed([job['id'] for job in user_jobs if job['file_path'] in failed], token,
+                                 "提取特征失败", self.max_attempts)
+            print(f"用户 {user_id}: 索引 {len(user_jobs) - len(failed)} 张照片，失败 {len(failed)} 张，"
+                  f"耗时 {time.time() - start:.2f}s")
+
+            try:
+                # 顺带补齐该用户元数据不完整的向量，检索接口不再做这件事
+                sync_vector_metadata(self.model_provider(), user_id)
+            except Exception as e:
+                print(f"同步用户 {user_id} 的向量元数据出错: {e}")
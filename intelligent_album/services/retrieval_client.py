@@ -0,0 +1,86 @@
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+
+
+class RetrievalServiceError(Exception):
+    """检索服务返回的错误"""
+
+
+class RetrievalClient:
+    """
+    检索服务（services/retrieval_server.py）的客户端代理，用法与 RetrievalModel 相同：
+    client.query(...)、client.add_images(...)、client.multilingual 等都转发到服务进程执行。
+    Connection 不是线程安全的，每个线程使用自己的连接；连接断开（服务重启）时自动重连一次。
+    请求发出之后才断开时，服务进程可能已经执行了该请求，只有只读方法会重试，写操作直接抛出异常。
+    """
+
+    METHODS = {
+        "query", "search", "encode_query_text", "extract_query_embeddings",
+        "add_image", "add_images", "delete_image", "compact", "get_cache_stats", "get_index_info",
+        "set_metadata", "missing_metadata", "find_similar",
+    }
+    # 重复执行没有副作用、可以在连接断开后重试的方法
+    READ_METHODS = {
+        "query", "search", "encode_query_text", "extract_query_embeddings", "get_cache_stats", "get_index_info",
+        "missing_metadata", "find_similar", "ping", "getattr",
+    }
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, method, *args, **kwargs):
+        request = {"method": method, "args": args, "kwargs": kwargs}
+        for attempt in range(2):
+            sent = False
+            try:
+                conn = self._connection()
+                conn.send(request)
+                sent = True
+                response = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._drop_connection()
+                if attempt == 1 or (sent and method not in self.READ_METHODS):
+                    raise
+        if not response["ok"]:
+            raise RetrievalServiceError(response["error"])
+        return response["result"]
+
+    def ping(self):
+        """服务是否可用"""
+        try:
+            return self.call("ping") == "pong"
+        except (EOFError, OSError, AuthenticationError, RetrievalServiceError):
+            return False
+
+    def notify_indexing(self):
+        """通知服务进程中的建索引队列有新任务"""
+        self.call("notify_indexing")
+
+    @property
+    def multilingual(self):
+        return self.call("getattr", "multilingual")
+
+    def __getattr__(self, name):
+        if name in self.METHODS:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        raise AttributeError(name)
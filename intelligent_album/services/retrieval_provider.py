@@ -0,0 +1,220 @@
+"""
+检索模型和后台建索引队列的进程级单例。
+导入本模块不会导入 torch / faiss / transformers，模型在第一次使用（get_retrieval_model）
+或显式预热（warm_up）时才加载，只服务相册/用户接口的进程不需要为模型付出启动时间和内存。
+
+本机运行着检索服务进程（services/retrieval_server.py）时，get_retrieval_model 返回连接该服务的 RetrievalClient，
+多个 Flask 工作进程共享同一份模型和索引；否则在当前进程中加载 RetrievalModel。
+"""
+import os
+import getpass
+import secrets
+import tempfile
+import threading
+import time
+
+from services.indexing_queue import IndexingQueue
+from services.retrieval_client import RetrievalClient
+
+RETRIEVAL_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'retrieval_model')
+# 多语言查询编码器及其投影（由 retrieval_model/multilingual.py 生成）
+MULTILINGUAL_MODEL_PATH = os.path.join(RETRIEVAL_ROOT, 'utils', 'hf_models', 'multilingual-text')
+MULTILINGUAL_PROJECTION_PATH = os.path.join(RETRIEVAL_ROOT, 'utils', 'multilingual_projection.npz')
+# 已导出的量化模型产物（由 retrieval_model/model_artifact.py 生成）
+MODEL_ARTIFACT_PATH = os.path.join(RETRIEVAL_ROOT, 'utils', 'model_artifact')
+# 热门查询的 embedding 落盘，服务重启后仍然有效
+QUERY_CACHE_PATH = os.path.join(RETRIEVAL_ROOT, 'utils', 'query_embeddings.sqlite')
+# 检索服务的运行目录（socket 路径长度有限制，不放在项目目录下），只有运行服务的用户可以访问，
+# 其中保存 Unix socket、单实例锁文件和服务启动时生成的连接认证密钥
+RETRIEVAL_RUN_DIR = os.environ.get('INTELLIGENT_ALBUM_RUN_DIR',
+                                   os.path.join(tempfile.gettempdir(), f'intelligent_album_{getpass.getuser()}'))
+RETRIEVAL_SOCKET_PATH = os.path.join(RETRIEVAL_RUN_DIR, 'retrieval.sock')
+RETRIEVAL_LOCK_PATH = os.path.join(RETRIEVAL_RUN_DIR, 'retrieval.lock')
+RETRIEVAL_AUTHKEY_PATH = os.path.join(RETRIEVAL_RUN_DIR, 'retrieval.authkey')
+# 设置了该环境变量时使用其值作为认证密钥，不读写密钥文件
+RETRIEVAL_AUTHKEY_ENV = 'INTELLIGENT_ALBUM_RETRIEVAL_AUTHKEY'
+
+_lock = threading.Lock()
+_retrieval_model = None
+_indexing_queue = None
+_load_seconds = None
+_mode = None
+
+
+def encoder_kwargs():
+    """
+    服务和建索引所用编码器的 RetrievalModel 参数；拟合多语言投影、评测时也用它构建 teacher，保证处于同一向量空间
+    导出了量化模型产物时直接加载它（量化模型），不再读取完整的 HF checkpoint；否则使用未量化的 BGE-VL-base
+    """
+    from retrieval_model.model_artifact import is_artifact
+
+    artifact = is_artifact(MODEL_ARTIFACT_PATH)
+    return {
+        "quantized": artifact,
+        "artifact_path": MODEL_ARTIFACT_PATH if artifact else None,
+        "use_bitblas": False,
+    }
+
+
+def build_local_model():
+    """在当前进程中加载检索模型"""
+    from retrieval_model.retrieval import RetrievalModel
+
+    # 测试能不能正常使用。模型加载路径在audoDL服务器上
+    # return RetrievalModel(
+    #     quantized=True,
+    #     use_bitblas=False
+    # )
+    multilingual = os.path.exists(MULTILINGUAL_MODEL_PATH) and os.path.exists(MULTILINGUAL_PROJECTION_PATH)
+    return RetrievalModel(
+        **encoder_kwargs(),
+        query_cache_path=QUERY_CACHE_PATH,
+        # 多语言查询编码器：模型和投影都存在、且投影是用当前编码器拟合的时启用，中文查询不再经过翻译
+        multilingual_model_path=MULTILINGUAL_MODEL_PATH if multilingual else None,
+        multilingual_projection_path=MULTILINGUAL_PROJECTION_PATH if multilingual else None
+    )
+
+
+def start_local_indexing_queue(model_provider):
+    """在当前进程中启动后台建索引队列"""
+    queue = IndexingQueue(model_provider, num_workers=1, batch_size=32)
+    queue.start()
+    return queue
+
+
+def ensure_run_dir(create=False):
+    """
+    检查运行目录是否只属于当前用户（其他用户可以预先创建同名目录来冒充检索服务），
+    create=True 时不存在则以 0700 权限创建；目录不可信时抛出 PermissionError，不存在时返回 False
+    """
+    if create:
+        os.makedirs(RETRIEVAL_RUN_DIR, mode=0o700, exist_ok=True)
+    try:
+        st = os.stat(RETRIEVAL_RUN_DIR)
+    except FileNotFoundError:
+        return False
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        raise PermissionError(f"检索服务运行目录 {RETRIEVAL_RUN_DIR} 不属于当前用户或权限过宽（应为 0700）")
+    return True
+
+
+def load_retrieval_authkey(create=False):
+    """
+    返回检索服务的连接认证密钥：优先使用环境变量，否则读取运行目录中的密钥文件；
+    密钥文件不存在时，create=True（服务进程启动）生成一个随机密钥并以 0600 权限写入，否则返回 None
+    """
+    authkey = os.environ.get(RETRIEVAL_AUTHKEY_ENV)
+    if authkey:
+        return authkey.encode()
+    try:
+        with open(RETRIEVAL_AUTHKEY_PATH, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        if not create:
+            return None
+    authkey = secrets.token_hex(32).encode()
+    fd = os.open(RETRIEVAL_AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(authkey)
+    return authkey
+
+
+def _service_client():
+    """检索服务进程可用时返回客户端，否则返回 None"""
+    try:
+        if not ensure_run_dir() or not os.path.exists(RETRIEVAL_SOCKET_PATH):
+            return None
+    except PermissionError as e:
+        print(f"不使用检索服务: {e}")
+        return None
+    authkey = load_retrieval_authkey()
+    if authkey is None:
+        return None
+    client = RetrievalClient(RETRIEVAL_SOCKET_PATH, authkey)
+    return client if client.ping() else None
+
+
+def _resolve_mode():
+    """第一次使用时确定使用检索服务（service）还是在本进程加载模型（local），调用方需持有 _lock"""
+    global _mode, _retrieval_model
+    if _mode is None:
+        client = _service_client()
+        if client is not None:
+            _retrieval_model = client
+            _mode = 'service'
+            print(f"使用检索服务: {RETRIEVAL_SOCKET_PATH}")
+        else:
+            _mode = 'local'
+    return _mode
+
+
+def get_retrieval_model():
+    """
+    获取进程内唯一的检索模型（或检索服务的客户端），第一次调用时加载
+    """
+    global _retrieval_model, _load_seconds
+    if _retrieval_model is None:
+        with _lock:
+            _resolve_mode()
+            if _retrieval_model is None:
+                start = time.time()
+                _retrieval_model = build_local_model()
+                _load_seconds = time.time() - start
+                print(f"检索模型加载完成，耗时 {_load_seconds:.2f}s")
+    return _retrieval_model
+
+
+def is_retrieval_model_loaded():
+    """检索模型是否已经加载"""
+    return _retrieval_model is not None
+
+
+class _RemoteIndexingQueue:
+    """使用检索服务时，建索引队列运行在服务进程中，这里只负责通知"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def notify(self):
+        try:
+            self.client.notify_indexing()
+        except Exception as e:
+            # 服务进程会定时轮询任务表，通知失败只会让任务晚一点被处理
+            print(f"通知检索服务失败: {e}")
+
+
+def get_indexing_queue():
+    """
+    获取进程内唯一的后台建索引队列，第一次调用时启动工作线程
+    队列启动本身不加载模型，工作线程领取到第一批任务时才会加载
+    """
+    global _indexing_queue
+    if _indexing_queue is None:
+        with _lock:
+            if _indexing_queue is None:
+                if _resolve_mode() == 'service':
+                    _indexing_queue = _RemoteIndexingQueue(_retrieval_model)
+                else:
+                    _indexing_queue = start_local_indexing_queue(get_retrieval_model)
+    return _indexing_queue
+
+
+def warm_up(encode_query=True):
+    """
+    预热：加载检索模型、启动建索引队列，并可选地编码一条查询，让第一次真实请求不必等待
+    """
+    model = get_retrieval_model()
+    get_indexing_queue()
+    if encode_query:
+        model.extract_query_embeddings(["warm up"])
+    return model
+
+
+def provider_stats():
+    """返回单例的加载状态"""
+    return {
+        "mode": _mode,
+        "model_loaded": _retrieval_model is not None,
+        "model_load_seconds": _load_seconds,
+        "indexing_queue_started": _indexing_queue is not None,
+    }
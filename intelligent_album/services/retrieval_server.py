@@ -0,0 +1,113 @@
+"""
+本机检索服务进程：独占 RetrievalModel 和各用户的 faiss 索引，Flask 的多个工作进程通过 Unix socket 调用它，
+模型权重和索引在每台机器上只保存一份，Web 进程数量可以独立扩展。
+每个客户端连接由一个线程处理，并发的文本查询在 RetrievalModel 内部由 TextEncodeBatcher 合并成一批编码；
+后台建索引队列也只在服务进程中运行。
+同一台机器上只能运行一个服务进程（持有运行目录中的锁文件），socket 只有运行服务的用户可以连接。
+用法: python services/retrieval_server.py
+"""
+import sys
+import os
+import threading
+import traceback
+from multiprocessing.connection import Listener
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval_model.file_lock import FileLock
+from services.retrieval_provider import RETRIEVAL_SOCKET_PATH, RETRIEVAL_LOCK_PATH, build_local_model, \
+    start_local_indexing_queue, ensure_run_dir, load_retrieval_authkey
+
+# 客户端可以调用的 RetrievalModel 方法和可以读取的属性
+EXPOSED_METHODS = {
+    "query", "search", "encode_query_text", "extract_query_embeddings",
+    "add_image", "add_images", "delete_image", "compact", "get_cache_stats", "get_index_info",
+    "set_metadata", "missing_metadata", "find_similar",
+}
+EXPOSED_ATTRIBUTES = {"multilingual"}
+
+
+class RetrievalServer:
+    """
+    接收 {"method": ..., "args": [...], "kwargs": {...}} 形式的请求，
+    返回 {"ok": True, "result": ...} 或 {"ok": False, "error": ...}
+    """
+
+    def __init__(self, address=RETRIEVAL_SOCKET_PATH, authkey=None, lock_path=RETRIEVAL_LOCK_PATH):
+        # authkey 为 None 时使用环境变量或运行目录中的密钥文件（不存在时生成）
+        self.address = address
+        self.authkey = authkey
+        self.lock_path = lock_path
+        self.model = None
+        self.indexing_queue = None
+
+    def handle(self, request):
+        method = request.get("method")
+        if method == "getattr":
+            name = request["args"][0]
+            if name not in EXPOSED_ATTRIBUTES:
+                raise AttributeError(f"attribute not exposed: {name}")
+            return getattr(self.model, name)
+        if method == "notify_indexing":
+            self.indexing_queue.notify()
+            return None
+        if method == "ping":
+            return "pong"
+        if method not in EXPOSED_METHODS:
+            raise AttributeError(f"method not exposed: {method}")
+        return getattr(self.model, method)(*request.get("args", ()), **request.get("kwargs", {}))
+
+    def serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    response = {"ok": True, "result": self.handle(request)}
+                except Exception as e:
+                    traceback.print_exc()
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                try:
+                    conn.send(response)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self):
+        ensure_run_dir(create=True)
+        # 锁文件在进程退出时由操作系统释放，拿不到说明已经有服务进程在运行，不能接管它的 socket
+        instance_lock = FileLock(self.lock_path)
+        if not instance_lock.acquire(blocking=False):
+            print(f"检索服务已在运行（{self.lock_path} 被占用），退出")
+            sys.exit(1)
+        if self.authkey is None:
+            self.authkey = load_retrieval_authkey(create=True)
+
+        self.model = build_local_model()
+        self.indexing_queue = start_local_indexing_queue(lambda: self.model)
+
+        # 持有锁时存在的 socket 文件只可能是上次异常退出时遗留的
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        print(f"检索服务已启动: {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"接受连接失败: {e}")
+                    continue
+                threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            instance_lock.release()
+
+
+def main():
+    RetrievalServer().serve_forever()
+
+
+if __name__ == "__main__":
+    main()
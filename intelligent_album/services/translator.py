@@ -0,0 +1,230 @@
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import md5
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Translator:
+    """
+    翻译后端接口：translate(text) 返回译文，失败时返回 None
+    """
+
+    name = "base"
+
+    def translate(self, text):
+        raise NotImplementedError
+
+
+class BaiduTranslator(Translator):
+    """
+    百度翻译 API 后端
+    复用同一个 requests.Session（连接池），每次请求都带超时，避免检索接口被网络问题卡住
+    """
+
+    name = "baidu"
+
+    def __init__(self, appid, appkey, from_lang='zh', to_lang='en',
+                 endpoint='http://api.fanyi.baidu.com', timeout=(2, 5), pool_size=8):
+        self.appid = appid
+        self.appkey = appkey
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self.url = endpoint + '/api/trans/vip/translate'
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def translate(self, text):
+        salt = random.randint(32768, 65536)
+        sign = md5((self.appid + text + str(salt) + self.appkey).encode('utf-8')).hexdigest()
+        payload = {
+            'appid': self.appid,
+            'q': text,
+            'from': self.from_lang,
+            'to': self.to_lang,
+            'salt': salt,
+            'sign': sign
+        }
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+        try:
+            r = self.session.post(self.url, params=payload, headers=headers, timeout=self.timeout)
+            result = r.json()
+        except Exception as e:
+            print(f"Baidu translate request failed: {e}")
+            return None
+        if 'trans_result' in result:
+            return '\n'.join([item['dst'] for item in result['trans_result']])
+        print(f"Baidu translate error: {result.get('error_msg', 'Unknown error')}")
+        return None
+
+
+class LocalTranslator(Translator):
+    """
+    本地离线翻译后端，不访问网络
+    指定 model_path 时使用本地的 transformers 翻译模型（如 Helsinki-NLP/opus-mt-zh-en），第一次调用时才加载；
+    否则按 dictionary 逐词替换，适合在测试中替代远程服务。
+    """
+
+    name = "local"
+
+    def __init__(self, model_path=None, dictionary=None, max_length=128):
+        self.model_path = model_path
+        self.dictionary = dictionary or {}
+        self.max_length = max_length
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+                self._model = AutoModelForSeq2SeqLM.from_pretrained(self.model_path).eval()
+
+    def translate(self, text):
+        if self.model_path is None:
+            if text in self.dictionary:
+                return self.dictionary[text]
+            words = [self.dictionary.get(word, word) for word in text.split()]
+            return ' '.join(words)
+
+        try:
+            self._load()
+            inputs = self._tokenizer([text], return_tensors='pt', truncation=True, max_length=self.max_length)
+            outputs = self._model.generate(**inputs, max_length=self.max_length)
+            return self._tokenizer.decode(outputs[0], skip_special_tokens=True)
+        except Exception as e:
+            print(f"Local translate failed: {e}")
+            return None
+
+
+class CachedTranslator:
+    """
+    带缓存的翻译器
+      1. 纯 ASCII 输入（英文查询）直接原样返回，不做翻译
+      2. 内存 LRU 缓存，键是原文；可选的 sqlite 磁盘缓存在进程重启后仍然有效
+      3. 后端失败时返回原文，不写入缓存，检索仍可继续
+    """
+
+    def __init__(self, backend, cache_path=None, max_entries=4096):
+        self.backend = backend
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.failures = 0
+
+        if self.cache_path:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS translations (
+                        backend TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        target TEXT NOT NULL,
+                        PRIMARY KEY (backend, source)
+                    )
+                """)
+
+    @contextmanager
+    def _connect(self):
+        # sqlite 连接不能跨线程共享，每次操作单独打开；
+        # sqlite3.Connection 作为上下文管理器只负责提交/回滚，不会关闭连接，这里用完显式关闭
+        conn = sqlite3.connect(self.cache_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def translate(self, text):
+        """
+        翻译查询文本，返回译文（无需翻译或翻译失败时返回原文）
+        """
+        text = text.strip()
+        if not text or text.isascii():
+            with self._lock:
+                self.skipped += 1
+            return text
+
+        with self._lock:
+            target = self._entries.get(text)
+            if target is not None:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return target
+
+        target = self._disk_get(text)
+        if target is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._put_memory(text, target)
+            return target
+
+        target = self.backend.translate(text)
+        with self._lock:
+            self.misses += 1
+            if target is None:
+                self.failures += 1
+                return text
+            self._put_memory(text, target)
+        self._disk_put(text, target)
+        return target
+
+    def _put_memory(self, text, target):
+        self._entries[text] = target
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, text):
+        if not self.cache_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT target FROM translations WHERE backend = ? AND source = ?",
+                                   (self.backend.name, text)).fetchone()
+        except sqlite3.Error as e:
+            print(f"translation cache: disk read failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def _disk_put(self, text, target):
+        if not self.cache_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO translations (backend, source, target) VALUES (?, ?, ?)",
+                             (self.backend.name, text, target))
+        except sqlite3.Error as e:
+            print(f"translation cache: disk write failed: {e}")
+
+    def stats(self):
+        """
+        返回翻译缓存的统计信息
+        """
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "failures": self.failures,
+            }